@@ -1,14 +1,18 @@
 import math
-import copy
 import random
 import time
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 from collections import Counter
 from game_logic import (
-    is_empty, check_next_empty_row, put_piece, win, draw, 
-    get_valid_locations, ROW_COUNT, COLUMN_COUNT, WIN_X, WIN_O,
-    SEGMENT_VALUES_O, SEGMENT_VALUES_X, MOVE_BONUS_X, MOVE_BONUS_O
+    is_empty, check_next_empty_row, put_piece, undo_piece, win, winning_move,
+    count_pieces, is_full, get_valid_locations, zobrist_hash, ZOBRIST_KEYS, ZOBRIST_SIDE,
+    ROW_COUNT, COLUMN_COUNT, WINDOWS, CELL_WINDOWS, CENTER_CELLS, WIN_X, WIN_O,
+    SEGMENT_VALUES_O, SEGMENT_VALUES_X, MOVE_BONUS_X, MOVE_BONUS_O,
+    Position, BOARD_HEIGHT_BITS, BOTTOM_MASK, BOARD_MASK, cell_bit, column_mask, winning_cells
 )
 
 # Helper methods
@@ -29,72 +33,81 @@ def evaluate_window(window, piece):
 
     return score
 
-def evaluate_board(board, piece=2):
-    score = 0
-
-    center_col = [board[i][3] for i in range(6)]
-    center_score = center_col.count(piece)
-    score += center_score * 6
-
-    for row in board:
-        for c in range(4):
-            window = row[c:c+4]
-            score += evaluate_window(window, piece)
-
-    for c in range(7):
-        col_array = [board[r][c] for r in range(6)]
-        for r in range(3):
-            window = col_array[r:r+4]
-            score += evaluate_window(window, piece)
-
-    for r in range(3):
-        for c in range(4):
-            window = [board[r+i][c+i] for i in range(4)]
-            score += evaluate_window(window, piece)
+# Window scores indexed by the base-3 code of a window's four cells, one table per piece
+WINDOW_CODES = [[(code // 27) % 3, (code // 9) % 3, (code // 3) % 3, code % 3] for code in range(81)]
+WINDOW_SCORES = {piece: [evaluate_window(cells, piece) for cells in WINDOW_CODES] for piece in (1, 2)}
+WINDOW_INDEX = np.array(WINDOWS)
+WINDOW_WEIGHTS = np.array([27, 9, 3, 1])
+
+def evaluate_position(board, piece):
+    # Center column bonus plus every window, scored by table lookup in a single pass
+    cells = [cell for row in board for cell in row]
+    table = WINDOW_SCORES[piece]
+    score = 6 * sum(1 for i in CENTER_CELLS if cells[i] == piece)
+    for a, b, c, d in WINDOWS:
+        score += table[27 * cells[a] + 9 * cells[b] + 3 * cells[c] + cells[d]]
+    return score
 
-    for r in range(3):
-        for c in range(4):
-            window = [board[r+3-i][c+i] for i in range(4)]
-            score += evaluate_window(window, piece)
+def evaluate_batch(boards, piece):
+    # Same score as evaluate_position for a stack of boards shaped (K, 6, 7)
+    cells = np.asarray(boards, dtype=np.int64).reshape(-1, ROW_COUNT * COLUMN_COUNT)
+    codes = cells[:, WINDOW_INDEX] @ WINDOW_WEIGHTS
+    scores = np.array(WINDOW_SCORES[piece])[codes].sum(axis=1)
+    return scores + 6 * (cells[:, CENTER_CELLS] == piece).sum(axis=1)
+
+# Window scores indexed by 5 * own pieces + opponent pieces
+WINDOW_COUNT_SCORES = {
+    piece: [evaluate_window([piece] * (state // 5) + [3 - piece] * (state % 5) + [0] * (4 - state // 5 - state % 5), piece)
+            if state // 5 + state % 5 <= 4 else 0 for state in range(25)]
+    for piece in (1, 2)
+}
+
+class IncrementalEvaluation:
+    # Keeps score_position(board, piece) up to date as pieces are put and undone
+    def __init__(self, board, piece=2):
+        self.piece = piece
+        self.table = WINDOW_COUNT_SCORES[piece]
+        self.windows = [0] * len(WINDOWS)
+        cells = [cell for row in board for cell in row]
+        for w, window in enumerate(WINDOWS):
+            for cell in window:
+                if cells[cell] == piece:
+                    self.windows[w] += 5
+                elif cells[cell] != 0:
+                    self.windows[w] += 1
+        self.score = evaluate_position(board, piece)
+
+    def put(self, row, col, piece):
+        cell = row * COLUMN_COUNT + col
+        step = 5 if piece == self.piece else 1
+        windows, table = self.windows, self.table
+        delta = 0
+        for w in CELL_WINDOWS[cell]:
+            state = windows[w]
+            windows[w] = state + step
+            delta += table[state + step] - table[state]
+        if step == 5 and col == COLUMN_COUNT // 2:
+            delta += 6
+        self.score += delta
+
+    def undo(self, row, col, piece):
+        cell = row * COLUMN_COUNT + col
+        step = 5 if piece == self.piece else 1
+        windows, table = self.windows, self.table
+        delta = 0
+        for w in CELL_WINDOWS[cell]:
+            state = windows[w]
+            windows[w] = state - step
+            delta += table[state - step] - table[state]
+        if step == 5 and col == COLUMN_COUNT // 2:
+            delta -= 6
+        self.score += delta
 
-    return score
+def evaluate_board(board, piece=2):
+    return evaluate_position(board, piece)
 
 def score_position(board, piece):
-    score = 0
-    WINDOW_LENGTH = 4
-    
-    # Score center column
-    center_array = [board[i][3] for i in range(6)]
-    center_count = center_array.count(piece)
-    score += center_count * 6
-
-    # Score Horizontal
-    for r in range(ROW_COUNT):
-        row_array = board[r]
-        for c in range(COLUMN_COUNT-3):
-            window = row_array[c:c+WINDOW_LENGTH]
-            score += evaluate_window(window, piece)
-
-    # Score Vertical
-    for c in range(COLUMN_COUNT):
-        col_array = [board[i][c] for i in range(6)]
-        for r in range(ROW_COUNT-3):
-            window = col_array[r:r+WINDOW_LENGTH]
-            score += evaluate_window(window, piece)
-
-    # Score positive sloped diagonal
-    for r in range(ROW_COUNT-3):
-        for c in range(COLUMN_COUNT-3):
-            window = [board[r+i][c+i] for i in range(WINDOW_LENGTH)]
-            score += evaluate_window(window, piece)
-
-    # Score negative sloped diagonal
-    for r in range(ROW_COUNT-3):
-        for c in range(COLUMN_COUNT-3):
-            window = [board[r+3-i][c+i] for i in range(WINDOW_LENGTH)]
-            score += evaluate_window(window, piece)
-
-    return score
+    return evaluate_position(board, piece)
 
 # A*
 
@@ -105,9 +118,9 @@ def a_star(board):
     for column in range(0, 7):
         if is_empty(board, column):
             row = check_next_empty_row(board, column)
-            new_board = copy.deepcopy(board)
-            new_board[row][column] = 2
-            score = evaluate_board(new_board)
+            put_piece(board, row, column, 2)
+            score = evaluate_board(board)
+            undo_piece(board, row, column)
             if score > best_score:
                 best_score = score
                 best_move = column
@@ -120,9 +133,9 @@ def a_star_with_level(board, level):
     for column in range(7):
         if is_empty(board, column):
             row = check_next_empty_row(board, column)
-            new_board = copy.deepcopy(board)
-            new_board[row][column] = 2
-            score = evaluate_board(new_board) + (level * 10)
+            put_piece(board, row, column, 2)
+            score = evaluate_board(board) + (level * 10)
+            undo_piece(board, row, column)
 
             if score > best_score:
                 best_score = score
@@ -130,95 +143,619 @@ def a_star_with_level(board, level):
 
     return best_move
 
+# Transposition Table
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# key (8) + value (8) + depth, flag and move (1 each)
+TT_ENTRY_BYTES = 19
+
+class TranspositionTable:
+    # Two-tier buckets: slot 0 keeps the deepest search, slot 1 is always replaced
+    def __init__(self, size_mb=16):
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * TT_ENTRY_BYTES))
+        slots = 2 * self.buckets
+        self.keys = array('Q', bytes(8 * slots))
+        self.values = array('q', bytes(8 * slots))
+        self.depths = array('b', [-1]) * slots
+        self.flags = array('b', bytes(slots))
+        self.moves = array('b', [-1]) * slots
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def probe(self, key):
+        slot = 2 * (key % self.buckets)
+        for s in (slot, slot + 1):
+            if self.depths[s] >= 0 and self.keys[s] == key:
+                self.hits += 1
+                move = self.moves[s]
+                return self.depths[s], self.flags[s], self.values[s], (move if move >= 0 else None)
+        if self.depths[slot] >= 0 or self.depths[slot + 1] >= 0:
+            self.collisions += 1
+        self.misses += 1
+        return None
+
+    def best_move(self, key):
+        slot = 2 * (key % self.buckets)
+        for s in (slot, slot + 1):
+            if self.depths[s] >= 0 and self.keys[s] == key and self.moves[s] >= 0:
+                return self.moves[s]
+        return None
+
+    def store(self, key, depth, flag, value, move):
+        slot = 2 * (key % self.buckets)
+        if self.keys[slot] != key and depth < self.depths[slot]:
+            slot += 1
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.depths[slot] = depth
+        self.flags[slot] = flag
+        self.moves[slot] = -1 if move is None else move
+
+    def clear(self):
+        slots = 2 * self.buckets
+        self.depths = array('b', [-1]) * slots
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "hit_rate": self.hits / probes if probes else 0.0,
+        }
+
 # MiniMax
 
-def minimax(board, depth, alpha, beta, maximizingPlayer):
+WIN_SCORE = 100000000000000
+LOSS_SCORE = -10000000000000
+
+class SearchTimeout(Exception):
+    pass
+
+CENTER_ORDER = [3, 2, 4, 1, 5, 0, 6]
+
+class MoveOrdering:
+    def __init__(self, center_first=True, tt_move=True, killers=True, history=True):
+        self.center_first = center_first
+        self.tt_move = tt_move
+        self.killers = killers
+        self.history = history
+        # Two killer slots per ply (indexed by pieces on the board) and a history score per piece and column
+        self.killer_moves = [[None, None] for _ in range(ROW_COUNT * COLUMN_COUNT + 1)]
+        self.history_table = {1: [0] * COLUMN_COUNT, 2: [0] * COLUMN_COUNT}
+
+    def order(self, moves, ply, piece, tt_move=None):
+        if self.center_first:
+            moves = [col for col in CENTER_ORDER if col in moves]
+        if self.history:
+            scores = self.history_table[piece]
+            moves = sorted(moves, key=lambda col: -scores[col])
+        first = []
+        if self.tt_move and tt_move in moves:
+            first.append(tt_move)
+        if self.killers:
+            for col in self.killer_moves[ply]:
+                if col in moves and col not in first:
+                    first.append(col)
+        if not first:
+            return moves
+        return first + [col for col in moves if col not in first]
+
+    def record_cutoff(self, col, ply, piece, depth):
+        if self.killers:
+            killers = self.killer_moves[ply]
+            if killers[0] != col:
+                killers[1] = killers[0]
+                killers[0] = col
+        if self.history:
+            self.history_table[piece][col] += depth * depth
+
+class SearchContext:
+    def __init__(self, deadline=None, ordering=None, evaluator=None, stop=None):
+        # stop is an optional threading.Event that cancels the search like a deadline
+        self.deadline = deadline
+        self.stop = stop
+        self.ordering = ordering
+        self.evaluator = evaluator
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def visit(self):
+        self.nodes += 1
+        if self.nodes & 255 == 0:
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchTimeout()
+            if self.stop is not None and self.stop.is_set():
+                raise SearchTimeout()
+
+    def cutoff(self, col, index, ply, piece, depth):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if self.ordering is not None:
+            self.ordering.record_cutoff(col, ply, piece, depth)
+
+    def stats(self):
+        return {
+            "nodes": self.nodes,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+        }
+
+def minimax(board, depth, alpha, beta, maximizingPlayer, last_move=None, move_count=None, tt=None, key=None, pv=None, search=None):
+    if search is not None:
+        search.visit()
+    if move_count is None:
+        move_count = count_pieces(board)
+
+    # Only the root needs a full scan; below it just the last placed piece can win
+    if last_move is None:
+        winner = 2 if win(2, board) else 1 if win(1, board) else 0
+    else:
+        row, col, piece = last_move
+        winner = piece if winning_move(board, row, col, piece) else 0
+
+    if winner == 2:
+        return (None, WIN_SCORE)
+    elif winner == 1:
+        return (None, LOSS_SCORE)
+    elif is_full(move_count):
+        return (None, 0)
+
+    tt_move = None
+    if tt is not None:
+        if key is None:
+            key = zobrist_hash(board) ^ (ZOBRIST_SIDE if maximizingPlayer else 0)
+        entry = tt.probe(key)
+        if entry is not None:
+            tt_depth, flag, tt_value, tt_move = entry
+            if tt_depth >= depth:
+                if flag == EXACT:
+                    return tt_move, tt_value
+                elif flag == LOWER_BOUND:
+                    alpha = max(alpha, tt_value)
+                else:
+                    beta = min(beta, tt_value)
+                if alpha >= beta:
+                    return tt_move, tt_value
+    alpha_orig, beta_orig = alpha, beta
+
+    evaluator = search.evaluator if search is not None else None
+    if depth == 0:
+        value = evaluator.score if evaluator is not None else score_position(board, 2)
+        if tt is not None:
+            tt.store(key, 0, EXACT, value, None)
+        return (None, value)
+
+    piece = 2 if maximizingPlayer else 1
     valid_locations = get_valid_locations(board)
-    is_terminal = win(1, board) or win(2, board) or draw(board)
-    
-    if depth == 0 or is_terminal:
-        if is_terminal:
-            if win(2, board):
-                return (None, 100000000000000)
-            elif win(1, board):
-                return (None, -10000000000000)
-            else:
-                return (None, 0)
-        else:
-            return (None, score_position(board, 2))
-            
+    column = random.choice(valid_locations)
+    if search is not None and search.ordering is not None:
+        valid_locations = search.ordering.order(valid_locations, move_count, piece, tt_move)
+    pv_move = pv[0] if pv else None
+    if pv_move in valid_locations:
+        valid_locations.remove(pv_move)
+        valid_locations.insert(0, pv_move)
+
     if maximizingPlayer:
         value = -math.inf
-        column = random.choice(valid_locations)
-        for col in valid_locations:
+        for index, col in enumerate(valid_locations):
             row = check_next_empty_row(board, col)
-            b_copy = copy.deepcopy(board)
-            put_piece(b_copy, row, col, 2)
-            new_score = minimax(b_copy, depth-1, alpha, beta, False)[1]
+            put_piece(board, row, col, 2)
+            if evaluator is not None:
+                evaluator.put(row, col, 2)
+            child_key = key ^ ZOBRIST_KEYS[2][row][col] ^ ZOBRIST_SIDE if tt is not None else None
+            child_pv = pv[1:] if col == pv_move else None
+            new_score = minimax(board, depth-1, alpha, beta, False, (row, col, 2), move_count + 1, tt, child_key, child_pv, search)[1]
+            undo_piece(board, row, col)
+            if evaluator is not None:
+                evaluator.undo(row, col, 2)
             if new_score > value:
                 value = new_score
                 column = col
             alpha = max(alpha, value)
             if alpha >= beta:
+                if search is not None:
+                    search.cutoff(col, index, move_count, piece, depth)
                 break
-        return column, value
 
     else:
         value = math.inf
-        column = random.choice(valid_locations)
-        for col in valid_locations:
+        for index, col in enumerate(valid_locations):
             row = check_next_empty_row(board, col)
-            b_copy = copy.deepcopy(board)
-            put_piece(b_copy, row, col, 1)
-            new_score = minimax(b_copy, depth-1, alpha, beta, True)[1]
+            put_piece(board, row, col, 1)
+            if evaluator is not None:
+                evaluator.put(row, col, 1)
+            child_key = key ^ ZOBRIST_KEYS[1][row][col] ^ ZOBRIST_SIDE if tt is not None else None
+            child_pv = pv[1:] if col == pv_move else None
+            new_score = minimax(board, depth-1, alpha, beta, True, (row, col, 1), move_count + 1, tt, child_key, child_pv, search)[1]
+            undo_piece(board, row, col)
+            if evaluator is not None:
+                evaluator.undo(row, col, 1)
             if new_score < value:
                 value = new_score
                 column = col
             beta = min(beta, value)
             if alpha >= beta:
+                if search is not None:
+                    search.cutoff(col, index, move_count, piece, depth)
                 break
-        return column, value
+
+    if tt is not None:
+        if value <= alpha_orig:
+            flag = UPPER_BOUND
+        elif value >= beta_orig:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        tt.store(key, depth, flag, value, column)
+    return column, value
+
+def principal_variation(board, tt, maximizingPlayer, max_length):
+    board = [row[:] for row in board]
+    key = zobrist_hash(board) ^ (ZOBRIST_SIDE if maximizingPlayer else 0)
+    piece = 2 if maximizingPlayer else 1
+    pv = []
+    while len(pv) < max_length:
+        col = tt.best_move(key)
+        if col is None or not is_empty(board, col):
+            break
+        row = check_next_empty_row(board, col)
+        put_piece(board, row, col, piece)
+        pv.append(col)
+        if winning_move(board, row, col, piece):
+            break
+        key ^= ZOBRIST_KEYS[piece][row][col] ^ ZOBRIST_SIDE
+        piece = 3 - piece
+    return pv
+
+def iterative_deepening(board, time_budget_ms, maximizingPlayer=True, tt=None, max_depth=None, ordering=None, book=None,
+                        stop=None, progress=None):
+    # Search depth 1, 2, 3... until the budget runs out or stop is set and keep the deepest
+    # finished result. A budget of None searches until stopped or max_depth is reached.
+    # progress, if given, is called with the move, score, depth, nodes and PV of each depth.
+    if book is not None:
+        entry = book.lookup(board)
+        if entry is not None:
+            column, value = entry
+            # Book scores are from the side to move's point of view, depth 0 marks a book move
+            value = value if maximizingPlayer else -value
+            if progress is not None:
+                progress({"move": column, "score": value, "depth": 0, "nodes": 0, "pv": [column]})
+            return column, value, 0
+    if ordering is None:
+        ordering = MoveOrdering()
+    if tt is None:
+        tt = TranspositionTable()
+    empty_cells = ROW_COUNT * COLUMN_COUNT - count_pieces(board)
+    if max_depth is None or max_depth > empty_cells:
+        max_depth = empty_cells
+    # A timed out search leaves pieces behind, so search a scratch copy
+    scratch = [list(row) for row in board]
+    deadline = time.perf_counter() + time_budget_ms / 1000 if time_budget_ms is not None else None
+    search = SearchContext(deadline=deadline, ordering=ordering, evaluator=IncrementalEvaluation(scratch), stop=stop)
+    column, value, completed_depth = None, None, 0
+    pv = None
+
+    for depth in range(1, max(max_depth, 1) + 1):
+        try:
+            column, value = minimax(scratch, depth, -math.inf, math.inf, maximizingPlayer, tt=tt, pv=pv, search=search)
+        except SearchTimeout:
+            break
+        completed_depth = depth
+        pv = principal_variation(board, tt, maximizingPlayer, depth)
+        if progress is not None:
+            progress({"move": column, "score": value, "depth": depth, "nodes": search.nodes, "pv": pv})
+        if value >= WIN_SCORE or value <= LOSS_SCORE:
+            break
+
+    if completed_depth == 0:
+        scratch = [list(row) for row in board]
+        column, value = minimax(scratch, 1, -math.inf, math.inf, maximizingPlayer, tt=tt)
+        completed_depth = 1
+        if progress is not None:
+            progress({"move": column, "score": value, "depth": 1, "nodes": search.nodes, "pv": [column]})
+    return column, value, completed_depth
 
 # MCTS
 
-class MCTSNode:
-    def __init__(self, board, move=None, parent=None, player_num=1):
-        self.board = board
-        self.move = move
-        self.parent = parent
-        self.children = {}
-        self.wins = 0
-        self.visits = 0
-        self.untried_moves = [col for col in range(7) if is_empty(board, col)]
+LOG_CACHE_SIZE = 1 << 16
+LOG_CACHE = [0.0] + [math.log(n) for n in range(1, LOG_CACHE_SIZE)]
+
+def log_visits(n):
+    return LOG_CACHE[n] if n < LOG_CACHE_SIZE else math.log(n)
+
+# MCTS-Solver proofs, from the point of view of the player who moved into the node
+PROVEN_WIN = 1
+PROVEN_LOSS = -1
+PROVEN_DRAW = 2
+
+# Nodes a new tree has room for before its buffers first grow
+MCTS_INITIAL_NODES = 4096
+
+class MCTSTree:
+    # Struct-of-arrays node store. Children of a node sit in one contiguous block, boards
+    # are rebuilt by replaying moves from the root, and wins and proofs are counted for
+    # the player who made the move leading into the node.
+    def __init__(self, max_nodes=1000000, exploration=2):
+        self.max_nodes = max_nodes
+        self.exploration = exploration
+        self.visits = array('i')
+        self.wins = array('i')
+        self.parent = array('i')
+        self.first_child = array('i')
+        self.child_count = array('b')
+        self.move = array('b')
+        self.proven = array('b')
+        self.capacity = 0
+        self.grow(min(max_nodes, MCTS_INITIAL_NODES))
+        self.size = 0
+        self.root_board = None
+        self.root_moves = 0
+        self.player_num = 1
+
+    def grow(self, capacity):
+        # The buffers start small and double as needed, so a short search does not pay for
+        # zeroing room for max_nodes nodes
+        extra = capacity - self.capacity
+        for values in (self.visits, self.wins, self.parent, self.first_child):
+            values.frombytes(bytes(4 * extra))
+        for values in (self.child_count, self.move, self.proven):
+            values.frombytes(bytes(extra))
+        self.capacity = capacity
+
+    def new_node(self, index, parent, move):
+        self.visits[index] = 0
+        self.wins[index] = 0
+        self.parent[index] = parent
+        self.first_child[index] = -1
+        self.child_count[index] = 0
+        self.move[index] = move
+        self.proven[index] = 0
+
+    def reset(self, board, player_num):
+        self.root_board = [[int(cell) for cell in row] for row in board]
+        self.root_moves = count_pieces(self.root_board)
         self.player_num = player_num
+        self.new_node(0, -1, -1)
+        self.size = 1
+
+    def expand(self, node, moves):
+        # At the node cap the tree stops growing and leaves keep being simulated
+        start = self.size
+        needed = start + len(moves)
+        if needed > self.capacity:
+            if needed > self.max_nodes:
+                return False
+            self.grow(min(self.max_nodes, max(2 * self.capacity, needed)))
+        for i, move in enumerate(moves):
+            self.new_node(start + i, node, move)
+        self.first_child[node] = start
+        self.child_count[node] = len(moves)
+        self.size = start + len(moves)
+        return True
+
+    def select_child(self, node):
+        # UCB1 over the contiguous child block, rewritten as (w + C * sqrt(ln N * n)) / n
+        # so each child costs one sqrt and one division; the first child wins ties.
+        # Proven children need no more simulations and are skipped.
+        start = self.first_child[node]
+        log_n = log_visits(self.visits[node])
+        exploration = self.exploration
+        visits, wins, proven, sqrt = self.visits, self.wins, self.proven, math.sqrt
+        best, best_score = start, -math.inf
+        for child in range(start, start + self.child_count[node]):
+            if proven[child]:
+                continue
+            n = visits[child]
+            score = (wins[child] + exploration * sqrt(log_n * n)) / n
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def select_leaf(self):
+        # Returns the leaf, the board at that leaf and the player to move there
+        board = [row[:] for row in self.root_board]
+        node = 0
+        player = self.player_num
+        moves_played = self.root_moves
+        while True:
+            count = self.child_count[node]
+            if count == 0:
+                moves = [col for col in range(COLUMN_COUNT) if board[ROW_COUNT - 1][col] == 0]
+                if not moves or not self.expand(node, moves):
+                    return node, board, player
+                count = len(moves)
+
+            start = self.first_child[node]
+            untried = [child for child in range(start, start + count) if self.visits[child] == 0]
+            node = random.choice(untried) if untried else self.select_child(node)
+            col = self.move[node]
+            row = check_next_empty_row(board, col)
+            put_piece(board, row, col, player)
+            moves_played += 1
+            if untried:
+                # A node is checked for the end of the game the first time it is reached
+                if winning_move(board, row, col, player):
+                    self.prove(node, PROVEN_WIN)
+                elif is_full(moves_played):
+                    self.prove(node, PROVEN_DRAW)
+                return node, board, 3 - player
+            player = 3 - player
+
+    def prove(self, node, result):
+        self.proven[node] = result
+        parent = self.parent[node]
+        while parent != -1 and not self.proven[parent]:
+            # The player to move at parent is the one who moved into node
+            if result == PROVEN_WIN:
+                result = PROVEN_LOSS
+            else:
+                outcomes = [self.proven[child] for child in self.children(parent)]
+                if 0 in outcomes:
+                    return
+                result = PROVEN_WIN if all(outcome == PROVEN_LOSS for outcome in outcomes) else PROVEN_DRAW
+            self.proven[parent] = result
+            parent = self.parent[parent]
+
+    def proven_tally(self, node, player):
+        # The outcome of a proven node as a single playout result
+        tally = [0, 0, 0]
+        result = self.proven[node]
+        if result == PROVEN_WIN:
+            tally[3 - player] = 1
+        elif result == PROVEN_LOSS:
+            tally[player] = 1
+        else:
+            tally[0] = 1
+        return tally
+
+    def backpropagate(self, node, player, tally):
+        # tally holds [draws, wins of player 1, wins of player 2] for the playouts run at node
+        visits = tally[0] + tally[1] + tally[2]
+        mover = 3 - player
+        while node != -1:
+            self.visits[node] += visits
+            self.wins[node] += tally[mover] - tally[3 - mover]
+            mover = 3 - mover
+            node = self.parent[node]
+
+    def children(self, node):
+        start = self.first_child[node]
+        return range(start, start + self.child_count[node]) if start != -1 else range(0)
+
+    def root_visits(self):
+        return {self.move[child]: self.visits[child] for child in self.children(0)}
+
+    def principal_variation(self, max_length=COLUMN_COUNT):
+        # Most visited child at each level
+        pv = []
+        node = 0
+        while len(pv) < max_length and self.child_count[node]:
+            node = max(self.children(node), key=lambda child: self.visits[child])
+            if self.visits[node] == 0:
+                break
+            pv.append(self.move[node])
+        return pv
+
+    def root_proofs(self):
+        return {self.move[child]: self.proven[child] for child in self.children(0) if self.proven[child]}
+
+    def find(self, board, player_num):
+        # The node reached from the root by the pieces board adds, if it is already in the tree
+        added = []
+        for r in range(ROW_COUNT):
+            for c in range(COLUMN_COUNT):
+                if board[r][c] != self.root_board[r][c]:
+                    if self.root_board[r][c] != 0:
+                        return None
+                    added.append((c, board[r][c]))
+        if len(added) > 2:
+            return None
+        # The root player moved first, then the opponent
+        added.sort(key=lambda move: move[1] != self.player_num)
+        node = 0
+        player = self.player_num
+        for col, piece in added:
+            if piece != player:
+                return None
+            node = next((child for child in self.children(node) if self.move[child] == col), None)
+            if node is None:
+                return None
+            player = 3 - player
+        return node if player == player_num else None
+
+    def promote(self, node):
+        # Moves node's subtree to the front of the store; everything else becomes free space
+        order = [node]
+        i = 0
+        while i < len(order):
+            start = self.first_child[order[i]]
+            if start != -1:
+                order.extend(range(start, start + self.child_count[order[i]]))
+            i += 1
+        order = np.array(order)
+        remap = np.full(self.size, -1, dtype=np.int32)
+        remap[order] = np.arange(len(order), dtype=np.int32)
+        first_child = np.frombuffer(self.first_child, dtype=np.int32)[order]
+        np.frombuffer(self.first_child, dtype=np.int32)[:len(order)] = np.where(first_child >= 0, remap[first_child], -1)
+        parent = np.frombuffer(self.parent, dtype=np.int32)[order]
+        np.frombuffer(self.parent, dtype=np.int32)[:len(order)] = np.where(parent >= 0, remap[parent], -1)
+        for values, dtype in ((self.visits, np.int32), (self.wins, np.int32), (self.child_count, np.int8),
+                              (self.move, np.int8), (self.proven, np.int8)):
+            view = np.frombuffer(values, dtype=dtype)
+            view[:len(order)] = view[order]
+        self.parent[0] = -1
+        self.size = len(order)
+
+    def advance(self, board, player_num):
+        # Our last move and the opponent's reply lead to a grandchild of the previous root
+        node = self.find(board, player_num) if self.size else None
+        if node is None:
+            self.reset(board, player_num)
+        else:
+            if node != 0:
+                self.promote(node)
+            self.root_board = [[int(cell) for cell in row] for row in board]
+            self.root_moves = count_pieces(self.root_board)
+            self.player_num = player_num
+
+# Playout policies pick the next move of a playout from a bitboard Position
+
+def random_policy(position):
+    return random.choice(position.valid_moves())
+
+COLUMN_MASKS = [column_mask(col) for col in range(COLUMN_COUNT)]
+
+def tactical_policy(position):
+    # Takes an immediate win, blocks an immediate loss, and otherwise plays randomly
+    # among the moves that do not fill the cell under an opponent's winning cell
+    mask = position.mask
+    possible = (mask + BOTTOM_MASK) & BOARD_MASK
+    winning = winning_cells(position.current, mask) & possible
+    if not winning:
+        threats = winning_cells(position.current ^ mask, mask)
+        winning = threats & possible
+        if not winning:
+            possible = possible & ~(threats >> 1) or possible
+            return random.choice([col for col in range(COLUMN_COUNT) if possible & COLUMN_MASKS[col]])
+    return ((winning & -winning).bit_length() - 1) // BOARD_HEIGHT_BITS
+
+PLAYOUT_POLICIES = {"random": random_policy, "tactical": tactical_policy}
+
+def policy_playout(board, player_num, policy):
+    # The board need not follow the move-count parity, so the side to move is set explicitly
+    position = Position()
+    for r in range(ROW_COUNT):
+        for c in range(COLUMN_COUNT):
+            piece = board[r][c]
+            if piece:
+                position.mask |= cell_bit(r, c)
+                position.heights[c] = r + 1
+                position.moves += 1
+                if piece == player_num:
+                    position.current |= cell_bit(r, c)
 
-    def UCB1(self, total_visits, C=2):
-        if self.visits == 0:
-            return float('inf')
-        win_rate = self.wins / self.visits
-        exploration_factor = C * math.sqrt((math.log(total_visits)) / self.visits)
-        return win_rate + exploration_factor
-
-    def select_child(self):
-        return max(self.children.values(), key=lambda child: child.UCB1(self.visits))
-
-    def add_child(self, move, player_num):
-        new_board = np.copy(self.board)
-        row = check_next_empty_row(new_board, move)
-        put_piece(new_board, row, move, player_num)
-        child_node = MCTSNode(new_board, move=move, parent=self, player_num=3 - player_num)
-        self.untried_moves.remove(move)
-        self.children[move] = child_node
-        return child_node
-
-    def update(self, result):
-        self.visits += 1
-        if result == self.player_num:
-            self.wins += 1
-        elif result != 0:
-            self.wins -= 1
-
-def simulate(board, player_num):
+    current_player = player_num
+    while position.moves < ROW_COUNT * COLUMN_COUNT:
+        col = policy(position)
+        if position.is_winning_move(col):
+            return current_player
+        position.play(col)
+        current_player = 3 - current_player
+    return 0
+
+def simulate(board, player_num, policy=None):
+    if policy is not None:
+        return policy_playout(board, player_num, policy)
     temp_board = np.copy(board)
     current_player = player_num
 
@@ -231,73 +768,185 @@ def simulate(board, player_num):
         row = check_next_empty_row(temp_board, move)
         put_piece(temp_board, row, move, current_player)
 
-        if win(current_player, temp_board):
+        if winning_move(temp_board, row, move, current_player):
             return current_player
 
         current_player = 3 - current_player
 
-def MCTS(root, time_limit=1):
-    start_time = time.time()
-    while (time.time() - start_time) < time_limit:
-        node = root
-
-        # Selection
-        while node.untried_moves == [] and node.children:
-            node = node.select_child()
-
-        # Expansion
-        if node.untried_moves:
-            move = random.choice(node.untried_moves)
-            node = node.add_child(move, node.player_num)
+# Windows through each cell, padded with an always-empty sentinel cell so every row has the same length
+SENTINEL_CELL = ROW_COUNT * COLUMN_COUNT
+CELL_WINDOW_INDEX = np.full((ROW_COUNT * COLUMN_COUNT, max(len(w) for w in CELL_WINDOWS), 4), SENTINEL_CELL)
+for cell, windows in enumerate(CELL_WINDOWS):
+    CELL_WINDOW_INDEX[cell, :len(windows)] = [WINDOWS[w] for w in windows]
+
+def simulate_batch(board, player_num, playouts=256, rng=None):
+    # Plays `playouts` random games side by side; returns [draws, wins of player 1, wins of player 2]
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(32))
+    start = np.asarray(board, dtype=np.int8).reshape(-1)
+    cells = np.zeros((playouts, SENTINEL_CELL + 1), dtype=np.int8)
+    cells[:, :SENTINEL_CELL] = start
+    heights = np.tile((start.reshape(ROW_COUNT, COLUMN_COUNT) != 0).sum(axis=0), (playouts, 1))
+    results = np.zeros(playouts, dtype=np.int8)
+    active = np.arange(playouts)
+    current_player = player_num
 
-        # Simulation
-        current_result = simulate(node.board, node.player_num)
+    while active.size:
+        legal = heights[active] < ROW_COUNT
+        # Games with a full board are draws
+        active = active[legal.any(axis=1)]
+        legal = legal[legal.any(axis=1)]
+        if not active.size:
+            break
+
+        # The largest random key among legal columns is a uniform legal move
+        moves = (rng.random(legal.shape) * legal).argmax(axis=1)
+        rows = heights[active, moves]
+        placed = rows * COLUMN_COUNT + moves
+        cells[active, placed] = current_player
+        heights[active, moves] += 1
+
+        lines = cells[active[:, None, None], CELL_WINDOW_INDEX[placed]]
+        won = (lines == current_player).all(axis=2).any(axis=1)
+        results[active[won]] = current_player
+        active = active[~won]
+        current_player = 3 - current_player
 
-        # Backpropagation
-        while node is not None:
-            node.update(current_result)
-            node = node.parent
-
-def monte_carlo(board, player_num=1, time_limit=1):
-    root = MCTSNode(np.copy(board), move=None, parent=None, player_num=player_num)
-    MCTS(root, time_limit)
-    valid_children = [child for child in root.children.values() if child.visits > 0]
-    if not valid_children:
-        valid_moves = [col for col in range(7) if is_empty(board, col)]
-        return random.choice(valid_moves) if valid_moves else None
-    
-    best_move = max(valid_children, key=lambda x: (x.visits, -abs(x.move - 3))).move
-    return best_move
+    return np.bincount(results, minlength=3).tolist()
 
-def monte_carlo_difficulty(board, player_num=1, simulations=100):
-    root = MCTSNode(np.copy(board), move=None, parent=None, player_num=player_num)
+def MCTS(tree, time_limit=1, simulations=None, playouts=1, policy=None, stop=None, progress=None, report_interval=0.1):
+    # Runs until the time limit passes, the simulation count is reached or stop is set,
+    # whichever comes first. With playouts > 1 every leaf is evaluated by a batch of games
+    # instead of one; batches of uniform random games run vectorized, batches with a policy
+    # run one by one. progress, if given, receives the simulations and PV every report_interval.
+    start_time = time.time()
+    next_report = start_time + report_interval
     simulations_done = 0
+    while True:
+        now = time.time()
+        if time_limit is not None and (now - start_time) >= time_limit:
+            break
+        if simulations is not None and simulations_done >= simulations:
+            break
+        if stop is not None and stop.is_set():
+            break
+        if progress is not None and now >= next_report:
+            report_mcts_progress(tree, simulations_done, progress)
+            next_report = now + report_interval
+        # Once the root is proven the result is known and no simulation can change it
+        if tree.proven[0]:
+            break
+
+        # Selection and expansion
+        node, board, player = tree.select_leaf()
 
-    while simulations_done < simulations:
-        node = root
-
-        while node.children and not node.untried_moves:
-            node = node.select_child()
-
-        if node.untried_moves:
-            move = random.choice(node.untried_moves)
-            node = node.add_child(move, node.player_num)
-
-        result = simulate(node.board, node.player_num)
+        # Simulation
+        if tree.proven[node]:
+            tally = tree.proven_tally(node, player)
+        elif playouts > 1 and policy is None:
+            tally = simulate_batch(board, player, playouts)
+        else:
+            tally = [0, 0, 0]
+            for _ in range(playouts):
+                tally[simulate(board, player, policy)] += 1
 
-        while node is not None:
-            node.update(result)
-            node = node.parent
+        # Backpropagation
+        tree.backpropagate(node, player, tally)
 
         simulations_done += 1
 
-    valid_children = [child for child in root.children.values() if child.visits > 0]
-    if not valid_children:
+    if progress is not None:
+        report_mcts_progress(tree, simulations_done, progress)
+
+def report_mcts_progress(tree, simulations, progress):
+    pv = tree.principal_variation()
+    progress({"move": pv[0] if pv else None, "depth": len(pv), "nodes": simulations, "pv": pv})
+
+def best_root_move(visits, board, proofs=None):
+    if proofs:
+        for move, result in proofs.items():
+            if result == PROVEN_WIN:
+                return move
+        # Avoid proven losses while any other move is left
+        safe = {move: count for move, count in visits.items() if proofs.get(move) != PROVEN_LOSS}
+        if safe:
+            visits = safe
+    visited = [move for move, count in visits.items() if count > 0]
+    if not visited:
         valid_moves = [col for col in range(7) if is_empty(board, col)]
         return random.choice(valid_moves) if valid_moves else None
-
-    best_move = max(valid_children, key=lambda x: (x.visits, -abs(x.move - 3))).move
-    return best_move
+    return max(visited, key=lambda move: (visits[move], -abs(move - 3)))
+
+# Root parallel MCTS
+
+_mcts_pool = None
+_mcts_pool_workers = 0
+
+def get_mcts_pool(workers):
+    # The pool outlives a single move so process start-up is only paid once. Workers are
+    # spawned rather than forked on every platform: the caller may be a search thread in a
+    # process running SDL, which a fork would copy in whatever state it is in.
+    global _mcts_pool, _mcts_pool_workers
+    if _mcts_pool is None or _mcts_pool_workers != workers:
+        if _mcts_pool is not None:
+            _mcts_pool.shutdown()
+        _mcts_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        _mcts_pool_workers = workers
+    return _mcts_pool
+
+def mcts_worker(board, player_num, time_limit, simulations, seed, playouts=1, exploration=2, policy=None):
+    random.seed(seed)
+    tree = MCTSTree(exploration=exploration)
+    tree.reset(board, player_num)
+    MCTS(tree, time_limit, simulations, playouts, policy)
+    return tree.root_visits(), tree.root_proofs()
+
+def parallel_root_stats(board, player_num, workers, time_limit=None, simulations=None, playouts=1, exploration=2, policy=None):
+    # Independent trees, one per process, merged by summing each root child's visits.
+    # A proof from any worker holds for all of them.
+    pool = get_mcts_pool(workers)
+    futures = []
+    for worker in range(workers):
+        share = None
+        if simulations is not None:
+            share = simulations // workers + (1 if worker < simulations % workers else 0)
+        seed = random.getrandbits(32)
+        futures.append(pool.submit(mcts_worker, [list(row) for row in board], player_num, time_limit, share, seed, playouts, exploration, policy))
+    visits = {}
+    proofs = {}
+    for future in futures:
+        worker_visits, worker_proofs = future.result()
+        for move, count in worker_visits.items():
+            visits[move] = visits.get(move, 0) + count
+        proofs.update(worker_proofs)
+    return visits, proofs
+
+def monte_carlo(board, player_num=1, time_limit=1, book=None, workers=1, playouts=1, tree=None, exploration=2, policy=None):
+    if book is not None:
+        entry = book.lookup(board)
+        if entry is not None:
+            return entry[0]
+    # A reused tree lives in this process, so it is searched serially
+    if workers > 1 and tree is None:
+        visits, proofs = parallel_root_stats(board, player_num, workers, time_limit=time_limit, playouts=playouts,
+                                             exploration=exploration, policy=policy)
+        return best_root_move(visits, board, proofs)
+    if tree is None:
+        tree = MCTSTree(exploration=exploration)
+    tree.advance(board, player_num)
+    MCTS(tree, time_limit, playouts=playouts, policy=policy)
+    return best_root_move(tree.root_visits(), board, tree.root_proofs())
+
+def monte_carlo_difficulty(board, player_num=1, simulations=100, workers=1, playouts=1, tree=None, exploration=2, policy=None):
+    if workers > 1 and tree is None:
+        visits, proofs = parallel_root_stats(board, player_num, workers, simulations=simulations, playouts=playouts,
+                                             exploration=exploration, policy=policy)
+        return best_root_move(visits, board, proofs)
+    if tree is None:
+        tree = MCTSTree(exploration=exploration)
+    tree.advance(board, player_num)
+    MCTS(tree, time_limit=None, simulations=simulations, playouts=playouts, policy=policy)
+    return best_root_move(tree.root_visits(), board, tree.root_proofs())
 
 # ID3 Decision Tree
 
@@ -346,6 +995,142 @@ def id3(df, attributes, target):
 
     return tree
 
+# Vectorized ID3: the data is integer-encoded once and every node counts all attributes at
+# once with bincount, recursing on row indices instead of DataFrame copies. The float
+# operations follow the pandas version step by step (classes and values in order of first
+# appearance, Python's log2) so both build exactly the same tree.
+
+def encode_dataset(df, attributes, target):
+    # Attribute codes follow first appearance, class codes are sorted so that the lowest
+    # code among equally frequent classes matches pandas' mode()
+    X = np.empty((len(df), len(attributes)), dtype=np.int16)
+    values = []
+    for i, attribute in enumerate(attributes):
+        codes, uniques = pd.factorize(df[attribute], sort=False)
+        X[:, i] = codes
+        values.append(list(uniques))
+    classes, y = np.unique(df[target].to_numpy(), return_inverse=True)
+    return X, y.astype(np.int16), values, classes
+
+def first_positions(codes, size):
+    # Index of each code's first appearance, size where a code does not appear
+    first = np.full(size, len(codes), dtype=np.int64)
+    positions = np.arange(len(codes), dtype=np.int32 if len(codes) < 2 ** 31 else np.int64)
+    # With repeated indices the last assignment wins, so writing in reverse keeps the first
+    first[codes[::-1]] = positions[::-1]
+    return first
+
+# prob * log2(prob) for prob = count / total, filled in for small totals on first use
+PLOGP_TABLE_SIZE = 1024
+_plogp_table = None
+
+def plogp_table():
+    global _plogp_table
+    if _plogp_table is None:
+        table = np.zeros((PLOGP_TABLE_SIZE + 1, PLOGP_TABLE_SIZE + 1))
+        for total in range(1, PLOGP_TABLE_SIZE + 1):
+            for count in range(1, total + 1):
+                prob = count / total
+                table[total, count] = prob * math.log2(prob)
+        _plogp_table = table
+    return _plogp_table
+
+def entropy_terms(counts, totals):
+    # prob * log2(prob) per class, with Python's log2 so the values match calculate_entropy
+    totals = np.broadcast_to(totals, counts.shape)
+    if totals.max() <= PLOGP_TABLE_SIZE:
+        return plogp_table()[totals, counts]
+    present = counts > 0
+    probs = np.where(present, counts, 1) / np.where(totals > 0, totals, 1)
+    unique_probs, inverse = np.unique(probs, return_inverse=True)
+    logs = np.array([math.log2(p) for p in unique_probs])
+    return np.where(present, probs * logs[inverse.reshape(probs.shape)], 0.0)
+
+def ordered_sum(terms, first, subtract):
+    # Accumulates terms from 0.0 along the last axis in order of first appearance; absent
+    # entries are exactly 0.0 so they do not change the result
+    order = np.argsort(first, axis=-1, kind="stable")
+    terms = np.take_along_axis(terms, order, axis=-1)
+    total = np.zeros(terms.shape[:-1])
+    for k in range(terms.shape[-1]):
+        total = total - terms[..., k] if subtract else total + terms[..., k]
+    return total
+
+# Most attribute x row cells id3_gains works on at once. Large nodes go one attribute at a
+# time, so the memory a node needs grows with its rows only.
+ID3_BLOCK_CELLS = 1 << 20
+
+def id3_gains(X, y, rows, columns, n_values, n_classes):
+    # Returns each attribute's gain and the row at which each of its values first appears
+    # (len(rows) for values that do not)
+    n = len(rows)
+    labels = y[rows]
+    class_counts = np.bincount(labels, minlength=n_classes)
+    total_entropy = ordered_sum(entropy_terms(class_counts, n), first_positions(labels, n_classes), True)
+    labels = labels.astype(np.int32)
+
+    gains = np.empty(len(columns))
+    value_first = np.empty((len(columns), n_values), dtype=np.int64)
+    block = max(1, ID3_BLOCK_CELLS // n)
+    for start in range(0, len(columns), block):
+        block_columns = columns[start:start + block]
+        k = len(block_columns)
+        # Contingency table of attribute x value x class for a block of attributes at once
+        codes = (X[rows[:, None], block_columns].astype(np.int32) + np.arange(k, dtype=np.int32) * n_values).ravel()
+        cells = codes * n_classes + np.repeat(labels, k)
+        size = k * n_values * n_classes
+        counts = np.bincount(cells, minlength=size).reshape(k, n_values, n_classes)
+        # The row-major ravel keeps rows in order, and dividing a position by k gives its row
+        class_first = (first_positions(cells, size) // k).reshape(k, n_values, n_classes)
+        block_first = (first_positions(codes, k * n_values) // k).reshape(k, n_values)
+
+        subset_sizes = counts.sum(axis=2)
+        subset_entropy = ordered_sum(entropy_terms(counts, subset_sizes[:, :, None]), class_first, True)
+        weights = subset_sizes / n
+        gains[start:start + k] = total_entropy - ordered_sum(weights * subset_entropy, block_first, False)
+        value_first[start:start + k] = block_first
+    return gains, value_first
+
+def build_id3(X, y, rows, columns, attributes, values, classes, n_values):
+    labels = y[rows]
+    first = labels[0]
+    if (labels == first).all():
+        return classes[first]
+    if len(columns) == 0:
+        return classes[np.bincount(labels, minlength=len(classes)).argmax()]
+
+    gains, value_first = id3_gains(X, y, rows, np.array(columns), n_values, len(classes))
+    # argmax keeps the first of equal gains, like max() over the attribute order
+    index = int(np.argmax(gains))
+    best = columns[index]
+
+    tree = {attributes[best]: {}}
+    codes = X[rows, best]
+    remaining = columns[:index] + columns[index + 1:]
+    # Branches in order of first appearance, like unique()
+    first = value_first[index]
+    for code in np.argsort(first, kind="stable"):
+        if first[code] == len(rows):
+            break
+        tree[attributes[best]][values[best][code]] = build_id3(X, y, rows[codes == code], remaining, attributes, values, classes, n_values)
+    return tree
+
+def id3_vectorized(df, attributes, target):
+    # Same tree as id3(df, attributes, target), built without copying the DataFrame
+    X, y, values, classes = encode_dataset(df, attributes, target)
+    # Values an attribute never takes have no rows and add exactly 0.0 to every sum
+    n_values = max(len(uniques) for uniques in values)
+    return build_id3(X, y, np.arange(len(df)), list(range(len(attributes))), attributes, values, classes, n_values)
+
+def id3_from_matrix(X, y, attributes=None, values=("0", "1", "2")):
+    # Same tree as id3_vectorized() on the equivalent DataFrame, trained straight from a
+    # (positions, moves) matrix such as the memory-mapped binary dataset. Cell values serve
+    # as the codes as they are: branches and sums only depend on first appearances.
+    attributes = attributes or [f"pos_{i}" for i in range(X.shape[1])]
+    classes, labels = np.unique(np.asarray(y), return_inverse=True)
+    return build_id3(X, labels, np.arange(len(labels)), list(range(len(attributes))), attributes,
+                     [list(values)] * len(attributes), classes, len(values))
+
 def classify_example(example, tree):
     if not isinstance(tree, dict):
         return tree
@@ -356,16 +1141,85 @@ def classify_example(example, tree):
     branch = tree[attribute][value]
     return classify_example(example, branch)
 
+class CompiledTree:
+    # An ID3 tree flattened into arrays: the attribute each node tests (-1 at a leaf), a
+    # child per attribute value (-1 where the tree has no branch) and the move at each leaf.
+    # Attributes are pos_0..pos_41 over the flattened board and values are the cell strings.
+    def __init__(self, tree, attributes=None, values=("0", "1", "2")):
+        attributes = attributes or [f"pos_{i}" for i in range(ROW_COUNT * COLUMN_COUNT)]
+        feature_index = {attribute: i for i, attribute in enumerate(attributes)}
+        value_index = {value: i for i, value in enumerate(values)}
+        # Raw cell values straight to value codes, so boards need no string encoding
+        self.value_codes = np.full(256, -1, dtype=np.int16)
+        for value, i in value_index.items():
+            self.value_codes[int(value)] = i
+
+        features, labels, children = [], [], []
+        stack = [(tree, None, None)]
+        while stack:
+            node, parent, value = stack.pop()
+            index = len(features)
+            if parent is not None:
+                children[parent][value] = index
+            children.append([-1] * len(values))
+            if isinstance(node, dict):
+                attribute = next(iter(node))
+                features.append(feature_index[attribute])
+                labels.append(-1)
+                for branch_value, branch in node[attribute].items():
+                    stack.append((branch, index, value_index[branch_value]))
+            else:
+                features.append(-1)
+                labels.append(int(node))
+        self.feature = np.array(features, dtype=np.int16)
+        self.label = np.array(labels, dtype=np.int16)
+        self.children = np.array(children, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.feature)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, feature=self.feature, label=self.label, children=self.children, value_codes=self.value_codes)
+
+    @classmethod
+    def load(cls, path):
+        compiled = cls.__new__(cls)
+        with np.load(path) as arrays:
+            for name in ("feature", "label", "children", "value_codes"):
+                setattr(compiled, name, arrays[name])
+        return compiled
+
+    def predict_batch(self, boards):
+        # Walks every board down one level per step; -1 marks boards that reach a value
+        # the tree has no branch for, where classify_example answers "Unknown"
+        cells = self.value_codes[np.asarray(boards, dtype=np.uint8).reshape(len(boards), -1)]
+        node = np.zeros(len(cells), dtype=np.int32)
+        active = np.flatnonzero(self.feature[node] >= 0)
+        while active.size:
+            values = cells[active, self.feature[node[active]]]
+            child = np.where(values >= 0, self.children[node[active], values], -1)
+            node[active] = child
+            active = active[child >= 0]
+            active = active[self.feature[node[active]] >= 0]
+        return np.where(node >= 0, self.label[np.maximum(node, 0)], -1)
+
+    def predict(self, board):
+        return int(self.predict_batch([board])[0])
+
 def encode_board(board):
     return ''.join(str(cell) for row in board for cell in row)
 
 def predict_move_with_tree(board, tree):
-    state = encode_board(board)
-    example = {}
-    for i, value in enumerate(state):
-        example[f"pos_{i}"] = value
+    if isinstance(tree, CompiledTree):
+        predicted_move = tree.predict(board)
+    else:
+        state = encode_board(board)
+        example = {}
+        for i, value in enumerate(state):
+            example[f"pos_{i}"] = value
 
-    predicted_move = classify_example(example, tree)
+        predicted_move = classify_example(example, tree)
 
     try:
         col = int(predicted_move)
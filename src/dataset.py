@@ -0,0 +1,139 @@
+import io
+import os
+import sys
+import argparse
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CSV_PATH = os.path.join(BASE_DIR, 'data', 'dataset_connect4.csv')
+DEFAULT_NPY_PATH = os.path.join(BASE_DIR, 'data', 'dataset_connect4.npy')
+
+# The binary dataset is an (N, 43) uint8 .npy matrix: the 42 cells of a position in the
+# order of the CSV's estado string (row by row from the bottom) followed by the move.
+CELLS = 42
+COLUMNS = CELLS + 1
+ZERO = ord('0')
+CSV_HEADER = b'estado,jogada\r\n'
+
+def npy_header(rows):
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, {'descr': '|u1', 'fortran_order': False, 'shape': (rows, COLUMNS)})
+    return header.getvalue()
+
+# The header is padded to a fixed size, so it can be rewritten in place as rows are appended
+NPY_HEADER_SIZE = len(npy_header(0))
+
+def csv_layout(path):
+    # Every estado,jogada line has the same width; returns the header and line lengths
+    with open(path, 'rb') as f:
+        header = f.readline()
+        line = f.readline()
+    if not header.startswith(b'estado,jogada'):
+        raise ValueError(f"{path} does not start with an estado,jogada header")
+    if line.rstrip(b'\r\n')[CELLS:CELLS + 1] != b',' or len(line.rstrip(b'\r\n')) != CELLS + 2:
+        raise ValueError(f"{path} does not hold 42-cell states with single-digit moves")
+    return len(header), len(line)
+
+def convert_csv(csv_path=DEFAULT_CSV_PATH, npy_path=DEFAULT_NPY_PATH, chunk_rows=1 << 20):
+    # Streams the fixed-width CSV through NumPy in chunks, so no Python strings are built and
+    # memory stays bounded however many positions there are
+    header_length, line_length = csv_layout(csv_path)
+    body = os.path.getsize(csv_path) - header_length
+    rows, rest = divmod(body, line_length)
+    # The last line may lack its line ending
+    last_line = rest == CELLS + 2
+    if rest and not last_line:
+        raise ValueError(f"{csv_path} has lines of different lengths")
+    rows += last_line
+
+    out = np.lib.format.open_memmap(npy_path + '.tmp', mode='w+', dtype=np.uint8, shape=(rows, COLUMNS))
+    with open(csv_path, 'rb') as f:
+        f.seek(header_length)
+        for start in range(0, rows, chunk_rows):
+            count = min(chunk_rows, rows - start)
+            raw = np.frombuffer(f.read(count * line_length), dtype=np.uint8)
+            if raw.size < count * line_length:
+                # Pad the unterminated last line
+                raw = np.concatenate([raw, np.zeros(count * line_length - raw.size, dtype=np.uint8)])
+            raw = raw.reshape(count, line_length)
+            if (raw[:, CELLS] != ord(',')).any():
+                raise ValueError(f"{csv_path} has lines of different lengths")
+            values = raw[:, list(range(CELLS)) + [CELLS + 1]] - ZERO
+            if (values[:, :CELLS] > 2).any() or (values[:, CELLS] > 6).any():
+                raise ValueError(f"{csv_path} has cells or moves out of range near row {start}")
+            out[start:start + count] = values
+    out.flush()
+    del out
+    os.replace(npy_path + '.tmp', npy_path)
+    return rows
+
+def load_dataset_matrix(path=DEFAULT_NPY_PATH):
+    # Memory-mapped (positions, moves) views of the binary dataset; nothing is read until used
+    data = np.load(path, mmap_mode='r')
+    if data.ndim != 2 or data.shape[1] != COLUMNS or data.dtype != np.uint8:
+        raise ValueError(f"{path} is not an (N, {COLUMNS}) uint8 dataset")
+    return data[:, :CELLS], data[:, CELLS]
+
+def encode_rows(positions, moves, binary):
+    # Rows in the file layout: cells then move as bytes, or fixed-width estado,jogada lines
+    positions = np.asarray(positions, dtype=np.uint8).reshape(len(moves), CELLS)
+    if binary:
+        rows = np.empty((len(moves), COLUMNS), dtype=np.uint8)
+        rows[:, :CELLS] = positions
+        rows[:, CELLS] = moves
+        return rows.tobytes()
+    lines = np.empty((len(moves), CELLS + 4), dtype=np.uint8)
+    lines[:, :CELLS] = positions + ZERO
+    lines[:, CELLS] = ord(',')
+    lines[:, CELLS + 1] = np.asarray(moves, dtype=np.uint8) + ZERO
+    lines[:, CELLS + 2:] = np.frombuffer(b'\r\n', dtype=np.uint8)
+    return lines.tobytes()
+
+class DatasetWriter:
+    # Appends rows to a CSV or .npy dataset one chunk at a time. keep_rows is how many rows of
+    # an earlier run to keep; anything after them is a chunk that was being written when that
+    # run stopped, and it is cut off.
+    def __init__(self, path, keep_rows=0):
+        self.binary = path.endswith('.npy')
+        self.header_size = NPY_HEADER_SIZE if self.binary else len(CSV_HEADER)
+        self.row_size = COLUMNS if self.binary else CELLS + 4
+        self.rows = keep_rows
+        size = self.header_size + keep_rows * self.row_size
+        if keep_rows and (not os.path.exists(path) or os.path.getsize(path) < size):
+            raise ValueError(f"{path} holds fewer than the {keep_rows} rows recorded for it")
+        self.file = open(path, 'r+b' if keep_rows else 'wb')
+        self.file.truncate(size)
+        if not keep_rows:
+            self.file.write(npy_header(0) if self.binary else CSV_HEADER)
+        self.file.seek(size)
+
+    def append(self, positions, moves):
+        self.file.write(encode_rows(positions, moves, self.binary))
+        self.rows += len(moves)
+        if self.binary:
+            self.file.seek(0)
+            self.file.write(npy_header(self.rows))
+            self.file.seek(0, os.SEEK_END)
+
+    def sync(self):
+        # Everything appended so far is on disk once this returns
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert an estado,jogada CSV into the binary dataset format.")
+    parser.add_argument("csv", nargs="?", default=DEFAULT_CSV_PATH)
+    parser.add_argument("--output", default=None, help="defaults to the CSV path with a .npy extension")
+    parser.add_argument("--chunk-rows", type=int, default=1 << 20)
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.csv)[0] + '.npy'
+    rows = convert_csv(args.csv, output, args.chunk_rows)
+    print(f"Wrote {rows} positions to {output}")
+
+if __name__ == "__main__":
+    sys.exit(main())
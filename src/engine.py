@@ -0,0 +1,280 @@
+import math
+import time
+import threading
+from game_logic import get_valid_locations, is_empty, check_next_empty_row, put_piece, winning_move
+from ai_algorithms import (
+    minimax, iterative_deepening, principal_variation, a_star, a_star_with_level, MCTS, MCTSTree, best_root_move,
+    predict_move_with_tree,
+    parallel_root_stats, TranspositionTable, MoveOrdering, SearchContext, SearchTimeout, IncrementalEvaluation
+)
+from solver import Solver, perfect_move
+
+# Every engine has the same interface: start(board, player_num, budget_ms, progress) returns a
+# SearchHandle at once and the search runs in a worker thread, so a caller such as the pygame
+# loop keeps running. Progress reports are dicts with any of "move", "score", "depth", "nodes"
+# and "pv". A budget of None searches until stop() is called, which is how pondering works.
+
+class SearchHandle:
+    def __init__(self, search, progress=None):
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._progress = progress
+        self._info = {}
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(search,), daemon=True)
+        self._thread.start()
+
+    def _run(self, search):
+        try:
+            result = search(self._stop, self._report)
+            with self._lock:
+                self._result = result
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def _report(self, info):
+        with self._lock:
+            self._info = dict(info)
+        if self._progress is not None:
+            self._progress(info)
+
+    def info(self):
+        with self._lock:
+            return dict(self._info)
+
+    def best_move_so_far(self):
+        with self._lock:
+            if self._done.is_set() and self._result is not None:
+                return self._result
+            return self._info.get("move")
+
+    def stop(self):
+        self._stop.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        # Returns the chosen move, or None if the search is still running after timeout
+        if not self._done.wait(timeout):
+            return None
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def stop_and_wait(self):
+        self.stop()
+        return self.wait()
+
+class Engine:
+    # Whether stopping a search early still leaves a move worth playing
+    anytime = True
+    # Whether pondering guesses the opponent's reply, see Ponderer
+    ponder_reply = True
+
+    def start(self, board, player_num, budget_ms=None, progress=None):
+        # The worker gets its own copy, the caller's board may change during the search
+        board = [list(row) for row in board]
+        return SearchHandle(lambda stop, report: self.search(board, player_num, budget_ms, stop, report), progress)
+
+    def best_move(self, board, player_num, budget_ms=None):
+        # Synchronous search in the calling thread, for scripts with no event loop to keep alive
+        return self.search([list(row) for row in board], player_num, budget_ms, threading.Event(), lambda info: None)
+
+    def search(self, board, player_num, budget_ms, stop, report):
+        raise NotImplementedError
+
+class MinimaxEngine(Engine):
+    # A fixed depth with no budget runs one alpha-beta search, anything else iterative deepening
+    def __init__(self, depth=None, tt=None, ordering=None, book=None):
+        self.depth = depth
+        self.tt = tt if tt is not None else TranspositionTable(size_mb=16)
+        self.ordering = ordering if ordering is not None else MoveOrdering()
+        self.book = book
+
+    def search(self, board, player_num, budget_ms, stop, report):
+        maximizing = player_num == 2
+        if self.depth is None or budget_ms is not None:
+            col, _, _ = iterative_deepening(board, budget_ms, maximizing, self.tt, max_depth=self.depth,
+                                            ordering=self.ordering, book=self.book, stop=stop, progress=report)
+            return col
+
+        # A stopped search leaves pieces behind, so search a scratch copy
+        scratch = [list(row) for row in board]
+        search = SearchContext(ordering=self.ordering, evaluator=IncrementalEvaluation(scratch), stop=stop)
+        try:
+            col, score = minimax(scratch, self.depth, -math.inf, math.inf, maximizing, tt=self.tt, search=search)
+        except SearchTimeout:
+            # Stopped early: fall back to the best move one ply deep
+            col, score = minimax(board, 1, -math.inf, math.inf, maximizing, tt=self.tt)
+            report({"move": col, "score": score, "depth": 1, "nodes": search.nodes, "pv": [col]})
+            return col
+        pv = principal_variation(board, self.tt, maximizing, self.depth)
+        report({"move": col, "score": score, "depth": self.depth, "nodes": search.nodes, "pv": pv or [col]})
+        return col
+
+class PerfectEngine(Engine):
+    # A stopped solve falls back to a one-ply search; its table stays warm for the next one
+    anytime = False
+
+    def __init__(self, solver=None, tt=None, book=None):
+        self.solver = solver if solver is not None else Solver()
+        self.tt = tt if tt is not None else TranspositionTable(size_mb=16)
+        self.book = book
+
+    def search(self, board, player_num, budget_ms, stop, report):
+        col, _, _ = perfect_move(board, budget_ms, self.solver, self.tt, book=self.book, stop=stop, progress=report)
+        return col
+
+class MCTSEngine(Engine):
+    # Without a tree every search starts from scratch; a given tree is reused between moves.
+    # With workers > 1 the search runs in the process pool and stop() takes effect when the
+    # workers return, so it needs a time or simulation limit.
+    def __init__(self, tree=None, simulations=None, playouts=1, policy=None, workers=1, book=None, exploration=2):
+        self.tree = tree
+        self.simulations = simulations
+        self.playouts = playouts
+        self.policy = policy
+        self.workers = workers
+        self.book = book
+        self.exploration = exploration
+        # Simulations per second of the last timed search, and whether a ponder search
+        # grew the tree since
+        self.rate = None
+        self.pondered = False
+
+    @property
+    def ponder_reply(self):
+        # A reused tree ponders the position after our move instead, growing a subtree for
+        # every reply, which the next search finds whatever the opponent plays
+        return self.tree is None
+
+    def search(self, board, player_num, budget_ms, stop, report):
+        if self.book is not None:
+            entry = self.book.lookup(board)
+            if entry is not None:
+                report({"move": entry[0], "score": entry[1], "depth": 0, "nodes": 0, "pv": [entry[0]]})
+                return entry[0]
+        time_limit = budget_ms / 1000 if budget_ms is not None else None
+        if self.workers > 1:
+            visits, proofs = parallel_root_stats(board, player_num, self.workers, time_limit=time_limit,
+                                                 simulations=self.simulations, playouts=self.playouts,
+                                                 exploration=self.exploration, policy=self.policy)
+            col = best_root_move(visits, board, proofs)
+            report({"move": col, "depth": 1, "nodes": sum(visits.values()), "pv": [col]})
+            return col
+        tree = self.tree if self.tree is not None else MCTSTree(exploration=self.exploration)
+        tree.advance(board, player_num)
+        simulations = self.simulations
+        if time_limit is None and simulations is None:
+            # A ponder search, whose visits under the actual reply the next search counts
+            self.pondered = True
+        elif simulations is None and self.pondered and self.rate is not None:
+            # Only search until the root has the visits a full budget would have given it
+            simulations = max(int(self.rate * time_limit) - tree.visits[0], 0)
+        start, visits = time.perf_counter(), tree.visits[0]
+        MCTS(tree, time_limit, simulations, self.playouts, self.policy, stop=stop, progress=report)
+        elapsed = time.perf_counter() - start
+        if time_limit is not None and simulations is None and elapsed > 0:
+            self.rate = (tree.visits[0] - visits) / elapsed
+        if time_limit is not None:
+            self.pondered = False
+        return best_root_move(tree.root_visits(), board, tree.root_proofs())
+
+class AStarEngine(Engine):
+    # One-ply searches finish at once, so there is nothing to cancel. The A* scoring always
+    # places piece 2, so for player 1 it looks at the board with the colours swapped.
+    def __init__(self, level=None):
+        self.level = level
+
+    def search(self, board, player_num, budget_ms, stop, report):
+        if player_num == 1:
+            board = [[(3 - cell) if cell else 0 for cell in row] for row in board]
+        col = a_star(board) if self.level is None else a_star_with_level(board, self.level)
+        report({"move": col, "depth": 1, "nodes": len(get_valid_locations(board)), "pv": [col]})
+        return col
+
+class ID3Engine(Engine):
+    # Plays the learned tree's move, a random legal one where the tree has no answer
+    def __init__(self, tree):
+        self.tree = tree
+
+    def search(self, board, player_num, budget_ms, stop, report):
+        col = predict_move_with_tree(board, self.tree)
+        report({"move": col, "depth": 0, "nodes": 1, "pv": [col]})
+        return col
+
+# Pondering: after its move the engine searches the position after the opponent's expected
+# reply, taken from the PV of its last search. If the opponent plays it, that search carries
+# on as the real one and the time already spent counts against the budget; otherwise it is
+# stopped, and the transposition table or solver table it warmed is reused. Engines without
+# ponder_reply search the position with the opponent to move instead, and that search is
+# always stopped once the reply is known.
+PONDER_GUESS_MS = 20
+
+def expected_reply(board, player_num):
+    col, _, _ = iterative_deepening(board, PONDER_GUESS_MS, player_num == 2, TranspositionTable(size_mb=1))
+    return col
+
+class Ponderer:
+    def __init__(self, engine, player_num, budget_ms=None):
+        self.engine = engine
+        self.player_num = player_num
+        self.budget_ms = budget_ms
+        self.last = None
+        self.handle = None
+        self.board = None
+        self.started = None
+        self.hits = 0
+        self.misses = 0
+
+    def search(self, board):
+        # The search for the move at board, reusing the ponder search when it guessed right
+        handle, self.handle = self.handle, None
+        if handle is not None and self.board is None:
+            handle.stop_and_wait()
+        elif handle is not None:
+            hit = board == self.board
+            self.hits += hit
+            self.misses += not hit
+            if hit and (handle.done() or self.engine.anytime):
+                if not handle.done() and self.budget_ms is not None:
+                    remaining = self.budget_ms / 1000 - (time.perf_counter() - self.started)
+                    timer = threading.Timer(max(remaining, 0), handle.stop)
+                    timer.daemon = True
+                    timer.start()
+                self.last = handle
+                return handle
+            handle.stop_and_wait()
+        self.last = self.engine.start(board, self.player_num, self.budget_ms)
+        return self.last
+
+    def ponder(self, board, played):
+        # Called with the board after our move `played`, while the opponent thinks
+        opponent = 3 - self.player_num
+        if not self.engine.ponder_reply:
+            if get_valid_locations(board):
+                self.board = None
+                self.handle = self.engine.start(board, opponent, None)
+            return
+        pv = self.last.info().get("pv", []) if self.last is not None else []
+        guess = pv[1] if len(pv) > 1 and pv[0] == played else expected_reply(board, opponent)
+        if guess is None or not is_empty(board, guess):
+            return
+        ponder_board = [list(row) for row in board]
+        row = check_next_empty_row(ponder_board, guess)
+        put_piece(ponder_board, row, guess, opponent)
+        if winning_move(ponder_board, row, guess, opponent) or not get_valid_locations(ponder_board):
+            return
+        self.board = ponder_board
+        self.started = time.perf_counter()
+        self.handle = self.engine.start(ponder_board, self.player_num, None)
+
+    def stop(self):
+        if self.handle is not None:
+            self.handle.stop()
+            self.handle = None
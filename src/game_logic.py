@@ -1,3 +1,4 @@
+import random
 import numpy as np
 
 ROW_COUNT = 6
@@ -9,6 +10,27 @@ SEGMENT_VALUES_X = {0: 0, 1: 1, 2: 10, 3: 50}
 MOVE_BONUS_X = 16
 MOVE_BONUS_O = -16
 
+def _build_windows():
+    # Every line of four cells as flat indices (row * COLUMN_COUNT + col)
+    windows = []
+    for r in range(ROW_COUNT):
+        for c in range(COLUMN_COUNT - 3):
+            windows.append(tuple(r * COLUMN_COUNT + c + i for i in range(4)))
+    for c in range(COLUMN_COUNT):
+        for r in range(ROW_COUNT - 3):
+            windows.append(tuple((r + i) * COLUMN_COUNT + c for i in range(4)))
+    for r in range(ROW_COUNT - 3):
+        for c in range(COLUMN_COUNT - 3):
+            windows.append(tuple((r + i) * COLUMN_COUNT + c + i for i in range(4)))
+    for r in range(ROW_COUNT - 3):
+        for c in range(COLUMN_COUNT - 3):
+            windows.append(tuple((r + 3 - i) * COLUMN_COUNT + c + i for i in range(4)))
+    return windows
+
+WINDOWS = _build_windows()
+CELL_WINDOWS = [[w for w, window in enumerate(WINDOWS) if cell in window] for cell in range(ROW_COUNT * COLUMN_COUNT)]
+CENTER_CELLS = [r * COLUMN_COUNT + COLUMN_COUNT // 2 for r in range(ROW_COUNT)]
+
 def create_board():
     return [[0 for _ in range(7)] for _ in range(6)]
 
@@ -23,6 +45,9 @@ def check_next_empty_row(board, col):
 def put_piece(board, row, col, piece):
     board[row][col] = piece
 
+def undo_piece(board, row, col):
+    board[row][col] = 0
+
 def get_valid_locations(board):
     res = []
     for i in range(7):
@@ -60,4 +85,211 @@ def draw(board):
         for j in range(7):
             if board[i][j] == 0:
                 return False
-    return True
\ No newline at end of file
+    return True
+
+def winning_move(board, row, col, piece):
+    # Only the four lines through the piece just placed can have become a win
+    for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        count = 1
+        r, c = row + dr, col + dc
+        while 0 <= r < ROW_COUNT and 0 <= c < COLUMN_COUNT and board[r][c] == piece:
+            count += 1
+            r += dr
+            c += dc
+        r, c = row - dr, col - dc
+        while 0 <= r < ROW_COUNT and 0 <= c < COLUMN_COUNT and board[r][c] == piece:
+            count += 1
+            r -= dr
+            c -= dc
+        if count >= 4:
+            return True
+    return False
+
+def count_pieces(board):
+    return sum(1 for row in board for cell in row if cell != 0)
+
+def is_full(move_count):
+    return move_count == ROW_COUNT * COLUMN_COUNT
+
+def winning_move_after(board, col, player):
+    row = check_next_empty_row(board, col)
+    put_piece(board, row, col, player)
+    won = winning_move(board, row, col, player)
+    undo_piece(board, row, col)
+    return won
+
+def random_opening(plies, rng=random):
+    # Random moves that do not end the game, player 1 first
+    moves = []
+    board = create_board()
+    player = 1
+    while len(moves) < plies:
+        col = rng.choice([c for c in get_valid_locations(board) if not winning_move_after(board, c, player)])
+        put_piece(board, check_next_empty_row(board, col), col, player)
+        moves.append(col)
+        player = 3 - player
+    return moves
+
+# Zobrist hashing
+
+_zobrist_rng = random.Random(0xC04)
+ZOBRIST_KEYS = {
+    piece: [[_zobrist_rng.getrandbits(64) for _ in range(COLUMN_COUNT)] for _ in range(ROW_COUNT)]
+    for piece in (1, 2)
+}
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)
+
+def zobrist_hash(board):
+    key = 0
+    for r in range(ROW_COUNT):
+        for c in range(COLUMN_COUNT):
+            piece = board[r][c]
+            if piece:
+                key ^= ZOBRIST_KEYS[piece][r][c]
+    return key
+
+# Bitboard
+
+# Each column uses ROW_COUNT + 1 bits (the extra bit is a sentinel that keeps
+# shifted lines from wrapping into the next column); bit = col * 7 + row.
+BOARD_HEIGHT_BITS = ROW_COUNT + 1
+BOTTOM_MASK = sum(1 << (c * BOARD_HEIGHT_BITS) for c in range(COLUMN_COUNT))
+BOARD_MASK = BOTTOM_MASK * ((1 << ROW_COUNT) - 1)
+
+def cell_bit(row, col):
+    return 1 << (col * BOARD_HEIGHT_BITS + row)
+
+def connected_four(bitboard):
+    # Vertical, horizontal and both diagonals
+    for shift in (1, BOARD_HEIGHT_BITS, BOARD_HEIGHT_BITS - 1, BOARD_HEIGHT_BITS + 1):
+        pairs = bitboard & (bitboard >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+def column_mask(col):
+    return ((1 << ROW_COUNT) - 1) << (col * BOARD_HEIGHT_BITS)
+
+def winning_cells(stones, mask):
+    # Empty cells that would complete four in a row for the given stones
+    h = BOARD_HEIGHT_BITS
+    cells = (stones << 1) & (stones << 2) & (stones << 3)
+    for shift in (h, h - 1, h + 1):
+        pair = (stones << shift) & (stones << 2 * shift)
+        cells |= pair & (stones << 3 * shift)
+        cells |= pair & (stones >> shift)
+        pair = (stones >> shift) & (stones >> 2 * shift)
+        cells |= pair & (stones << shift)
+        cells |= pair & (stones >> 3 * shift)
+    return cells & (BOARD_MASK ^ mask)
+
+class Position:
+    def __init__(self):
+        # current: stones of the player to move, mask: every stone on the board
+        self.current = 0
+        self.mask = 0
+        self.heights = [0] * COLUMN_COUNT
+        self.moves = 0
+
+    def copy(self):
+        position = Position()
+        position.current = self.current
+        position.mask = self.mask
+        position.heights = self.heights[:]
+        position.moves = self.moves
+        return position
+
+    def player(self):
+        return 1 + (self.moves & 1)
+
+    def can_play(self, col):
+        return self.heights[col] < ROW_COUNT
+
+    def valid_moves(self):
+        return [col for col in range(COLUMN_COUNT) if self.heights[col] < ROW_COUNT]
+
+    def play(self, col):
+        self.current ^= self.mask
+        self.mask |= 1 << (col * BOARD_HEIGHT_BITS + self.heights[col])
+        self.heights[col] += 1
+        self.moves += 1
+
+    def undo(self, col):
+        self.heights[col] -= 1
+        self.mask ^= 1 << (col * BOARD_HEIGHT_BITS + self.heights[col])
+        self.current ^= self.mask
+        self.moves -= 1
+
+    def is_winning_move(self, col):
+        stone = 1 << (col * BOARD_HEIGHT_BITS + self.heights[col])
+        return connected_four(self.current | stone)
+
+    def last_move_won(self):
+        return connected_four(self.current ^ self.mask)
+
+    def possible(self):
+        return (self.mask + BOTTOM_MASK) & BOARD_MASK
+
+    def can_win_next(self):
+        return winning_cells(self.current, self.mask) & self.possible() != 0
+
+    def possible_non_losing_moves(self):
+        # Playable cells that do not hand the opponent an immediate win
+        possible = self.possible()
+        opponent_win = winning_cells(self.current ^ self.mask, self.mask)
+        forced = possible & opponent_win
+        if forced:
+            if forced & (forced - 1):
+                return 0
+            possible = forced
+        return possible & ~(opponent_win >> 1)
+
+    def move_score(self, col):
+        stone = 1 << (col * BOARD_HEIGHT_BITS + self.heights[col])
+        return bin(winning_cells(self.current | stone, self.mask)).count("1")
+
+    def is_full(self):
+        return self.moves == ROW_COUNT * COLUMN_COUNT
+
+    def stones(self, piece):
+        if piece == self.player():
+            return self.current
+        return self.current ^ self.mask
+
+    def has_won(self, piece):
+        return connected_four(self.stones(piece))
+
+    def key(self):
+        # Unique per position: adding the mask marks the first empty cell of every column
+        return self.current + self.mask
+
+    @classmethod
+    def from_board(cls, board):
+        position = cls()
+        stones = {1: 0, 2: 0}
+        for r in range(ROW_COUNT):
+            for c in range(COLUMN_COUNT):
+                piece = board[r][c]
+                if piece:
+                    stones[piece] |= cell_bit(r, c)
+                    position.heights[c] = r + 1
+        count_1 = bin(stones[1]).count("1")
+        count_2 = bin(stones[2]).count("1")
+        if count_1 - count_2 not in (0, 1):
+            raise ValueError("Board is not reachable with player 1 moving first")
+        position.mask = stones[1] | stones[2]
+        position.moves = count_1 + count_2
+        position.current = stones[position.player()]
+        return position
+
+    def to_board(self):
+        board = create_board()
+        piece = self.player()
+        for r in range(ROW_COUNT):
+            for c in range(COLUMN_COUNT):
+                bit = cell_bit(r, c)
+                if self.current & bit:
+                    board[r][c] = piece
+                elif self.mask & bit:
+                    board[r][c] = 3 - piece
+        return board
@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import pickle
+import zipfile
+import hashlib
+import argparse
+import pandas as pd
+from ai_algorithms import id3_vectorized, id3_from_matrix, CompiledTree
+from dataset import load_dataset_matrix
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATASET_PATH = os.path.join(BASE_DIR, 'data', 'dataset_connect4.csv')
+DEFAULT_MODEL_DIR = os.path.join(BASE_DIR, 'data', 'models')
+
+# Bump when the trainer or the stored format changes, so older models are rebuilt
+MODEL_VERSION = 1
+ATTRIBUTES = [f"pos_{i}" for i in range(42)]
+TARGET = "jogada"
+
+def dataset_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cached_dataset_hash(path, model_dir=DEFAULT_MODEL_DIR):
+    # dataset_hash, re-read only when the file's size or modification time changed since
+    # the digest was stored, so loading a model does not read a large dataset every time
+    index_path = os.path.join(model_dir, "digests.json")
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    entry = index.get(key)
+    if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+    digest = dataset_hash(path)
+    index[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+    os.makedirs(model_dir, exist_ok=True)
+    temporary = f"{index_path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(temporary, index_path)
+    return digest
+
+def model_key(data_hash, params):
+    # The file name changes with the dataset, the training parameters and the format version
+    blob = json.dumps({"version": MODEL_VERSION, "dataset": data_hash, "params": params}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+def load_dataset(path=DEFAULT_DATASET_PATH):
+    # One text column per cell; read as text, as numbers the states would lose their leading zeros
+    df = pd.read_csv(path, dtype={"estado": str})
+    for i in range(42):
+        df[f"pos_{i}"] = df["estado"].str[i]
+    return df.drop(columns=["estado"])
+
+def plain_tree(tree):
+    # NumPy leaves pickle several times slower than ints
+    if isinstance(tree, dict):
+        return {attribute: {value: plain_tree(branch) for value, branch in branches.items()}
+                for attribute, branches in tree.items()}
+    return int(tree)
+
+def save_model(path, tree, data_hash, params):
+    model = {"version": MODEL_VERSION, "dataset": data_hash, "params": params, "tree": plain_tree(tree)}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so a reader never sees half a model
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+def load_model(path, data_hash, params):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            model = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if model.get("version") != MODEL_VERSION or model.get("dataset") != data_hash or model.get("params") != params:
+        return None
+    return model["tree"]
+
+def train_id3(dataset_path, attributes, target):
+    if dataset_path.endswith('.npy'):
+        # The binary dataset is read in place through a memory map
+        X, y = load_dataset_matrix(dataset_path)
+        if attributes != ATTRIBUTES:
+            X = X[:, [ATTRIBUTES.index(attribute) for attribute in attributes]]
+        return id3_from_matrix(X, y, attributes)
+    return id3_vectorized(load_dataset(dataset_path), attributes, target)
+
+def load_id3_model(dataset_path=DEFAULT_DATASET_PATH, model_dir=DEFAULT_MODEL_DIR, attributes=None, target=TARGET,
+                   rebuild=False):
+    # The cached tree for this dataset, trained and saved first if there is none yet
+    attributes = list(attributes or ATTRIBUTES)
+    params = {"algorithm": "id3", "attributes": attributes, "target": target}
+    data_hash = cached_dataset_hash(dataset_path, model_dir)
+    path = os.path.join(model_dir, f"id3-{model_key(data_hash, params)}.pkl")
+    tree = None if rebuild else load_model(path, data_hash, params)
+    if tree is None:
+        print("No cached model for this dataset. Training...")
+        start = time.perf_counter()
+        tree = train_id3(dataset_path, attributes, target)
+        save_model(path, tree, data_hash, params)
+        print(f"Trained in {time.perf_counter() - start:.1f} s, saved to {path}")
+    return tree
+
+def load_compiled_id3_model(dataset_path=DEFAULT_DATASET_PATH, model_dir=DEFAULT_MODEL_DIR, rebuild=False):
+    # The array form of the cached tree, stored next to it so loading skips the compile step
+    params = {"algorithm": "id3", "attributes": ATTRIBUTES, "target": TARGET}
+    data_hash = cached_dataset_hash(dataset_path, model_dir)
+    path = os.path.join(model_dir, f"id3-{model_key(data_hash, params)}.npz")
+    if not rebuild and os.path.exists(path):
+        try:
+            return CompiledTree.load(path)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            pass
+    compiled = CompiledTree(load_id3_model(dataset_path, model_dir, rebuild=rebuild))
+    os.makedirs(model_dir, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    compiled.save(temporary)
+    os.replace(temporary, path)
+    return compiled
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the ID3 model and cache it next to the dataset.")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_PATH, help="an estado,jogada CSV or its .npy conversion")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="train even if a cached model exists")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    load_compiled_id3_model(args.dataset, args.model_dir, rebuild=args.rebuild)
+    print(f"Model ready in {1000 * (time.perf_counter() - start):.0f} ms")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,22 @@
 import pygame
 import sys
 import time
-import math
 import copy
-import pandas as pd
 from button import Button
 import os
 from game_logic import (
     create_board, is_empty, check_next_empty_row, put_piece, win, 
     ROW_COUNT, COLUMN_COUNT
 )
-from ai_algorithms import (
-    minimax, monte_carlo, monte_carlo_difficulty, a_star, a_star_with_level,
-    id3, predict_move_with_tree
-)
-
-pygame.init()
+from ai_algorithms import predict_move_with_tree, get_mcts_pool, MCTSTree, TranspositionTable, MoveOrdering, tactical_policy
+from engine import MinimaxEngine, PerfectEngine, MCTSEngine, AStarEngine, Ponderer
+from opening_book import load_opening_book, book_for_depth
+from id3_model import load_compiled_id3_model
 
 WIDTH = 1280
 HEIGHT = 720
-SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Connect 4 AI")
+# Set by setup_display()
+SCREEN = BG = PLAY_IMG = QUIT_IMG = FONT_PATH = None
 
 BLACK = (0, 0, 0)
 BLUE = (0, 0, 255)
@@ -33,19 +29,30 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ASSETS_DIR = os.path.join(BASE_DIR, 'assets')
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 
-try:
-    BG = pygame.image.load(os.path.join(ASSETS_DIR, "Background.png"))
-    PLAY_IMG = pygame.image.load(os.path.join(ASSETS_DIR, "Play Rect.png"))
-    QUIT_IMG = pygame.image.load(os.path.join(ASSETS_DIR, "Quit Rect.png"))
-    FONT_PATH = os.path.join(ASSETS_DIR, "font.ttf")
-except FileNotFoundError:
-    print("Error: Assets not found. Check the assets folder.")
-    sys.exit()
+def setup_display():
+    # Opens the window and loads the assets. Not done on import: the MCTS pool's spawned
+    # workers import this module too, and each would open a window of its own.
+    global SCREEN, BG, PLAY_IMG, QUIT_IMG, FONT_PATH
+    pygame.init()
+    SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Connect 4 AI")
+    try:
+        BG = pygame.image.load(os.path.join(ASSETS_DIR, "Background.png"))
+        PLAY_IMG = pygame.image.load(os.path.join(ASSETS_DIR, "Play Rect.png"))
+        QUIT_IMG = pygame.image.load(os.path.join(ASSETS_DIR, "Quit Rect.png"))
+        FONT_PATH = os.path.join(ASSETS_DIR, "font.ttf")
+    except FileNotFoundError:
+        print("Error: Assets not found. Check the assets folder.")
+        sys.exit()
 
 def get_font(size):
     return pygame.font.Font(FONT_PATH, size)
 
 c4_tree_full = None
+MCTS_WORKERS = os.cpu_count() or 1
+opening_book = load_opening_book()
+# About the depth a one-second iterative deepening reaches in the opening
+TIMED_SEARCH_DEPTH = 10
 
 # Helper methods
 
@@ -67,6 +74,31 @@ def draw_board(board):
     
     pygame.display.update()
 
+def pause(seconds):
+    # Like time.sleep, but the window keeps handling events
+    clock = pygame.time.Clock()
+    end = time.time() + seconds
+    while time.time() < end:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT: pygame.quit(); sys.exit()
+        clock.tick(30)
+
+def wait_for_move(handle, back_button, delay=0):
+    # Pumps events while the engine searches in its worker thread and returns (left, col), where
+    # left is True if the player pressed BACK. The move comes no sooner than delay seconds.
+    clock = pygame.time.Clock()
+    start = time.time()
+    while not handle.done() or time.time() - start < delay:
+        MOUSE_POS = pygame.mouse.get_pos()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                handle.stop(); pygame.quit(); sys.exit()
+            if event.type == pygame.MOUSEBUTTONDOWN and back_button.checkForInput(MOUSE_POS):
+                handle.stop()
+                return True, None
+        clock.tick(30)
+    return False, handle.wait()
+
 # Loops
 
 def pvp_game():
@@ -104,7 +136,7 @@ def pvp_game():
                             print(f'Player {player} wins!')
                             game_over = True
                             draw_board(board)
-                            time.sleep(3)
+                            pause(3)
                             return
 
                         turn = (turn + 1) % 2
@@ -113,6 +145,7 @@ def pvp_game():
 
 def a_star_game():
     board = create_board()
+    engine = AStarEngine()
     game_over = False
     turn = 0
     draw_board(board)
@@ -140,8 +173,8 @@ def a_star_game():
                         draw_board(board)
 
         if turn == 1 and not game_over:
-            time.sleep(1)
-            col = a_star(board)
+            left, col = wait_for_move(engine.start(board, 2), BACK_BUTTON, delay=1)
+            if left: return
             if col is not None and is_empty(board, col):
                 row = check_next_empty_row(board, col)
                 put_piece(board, row, col, 2)
@@ -154,10 +187,11 @@ def a_star_game():
                 print("Draw or error on AI")
                 game_over = True
 
-    time.sleep(3)
+    pause(3)
 
 def a_star_game_with_difficulty(level):
     board = create_board()
+    engine = AStarEngine(level)
     game_over = False
     turn = 0
     draw_board(board)
@@ -183,8 +217,8 @@ def a_star_game_with_difficulty(level):
                         draw_board(board)
 
         if turn == 1 and not game_over:
-            time.sleep(0.5)
-            col = a_star_with_level(board, level)
+            left, col = wait_for_move(engine.start(board, 2), BACK_BUTTON, delay=0.5)
+            if left: return
             if col is not None and is_empty(board, col):
                 row = check_next_empty_row(board, col)
                 put_piece(board, row, col, 2)
@@ -194,10 +228,13 @@ def a_star_game_with_difficulty(level):
                 turn = 0
                 draw_board(board)
 
-    time.sleep(3)
+    pause(3)
 
-def mc_game():
+def play_against_engine(engine, budget_ms=None):
+    # The player is 1 and the engine 2; the engine searches on the player's time as well, see Ponderer
+    ponderer = Ponderer(engine, 2, budget_ms=budget_ms)
     board = create_board()
+    clock = pygame.time.Clock()
     game_over = False
     turn = 0
     draw_board(board)
@@ -210,7 +247,7 @@ def mc_game():
         for event in pygame.event.get():
             if event.type == pygame.QUIT: pygame.quit(); sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
-                if BACK_BUTTON.checkForInput(MOUSE_POS): return
+                if BACK_BUTTON.checkForInput(MOUSE_POS): ponderer.stop(); return
                 if turn == 0:
                     col = int(event.pos[0] // 182.8)
                     if is_empty(board, col):
@@ -221,88 +258,53 @@ def mc_game():
                         draw_board(board)
 
         if turn == 1 and not game_over:
-            col = monte_carlo(board)
+            left, col = wait_for_move(ponderer.search(board), BACK_BUTTON)
+            if left: return
             if col is not None and is_empty(board, col):
                 row = check_next_empty_row(board, col)
                 put_piece(board, row, col, 2)
                 if win(2, board): game_over = True
+                else: ponderer.ponder(board, col)
                 turn = 0
                 draw_board(board)
-    
-    time.sleep(3)
-
-def monte_carlo_game_custom(simulations):
-    board = create_board()
-    game_over = False
-    turn = 0
-    draw_board(board)
-    BACK_BUTTON = Button(image=None, pos=(1150, 690), text_input="BACK", font=get_font(40), base_color="Black", hovering_color="Green")
+        clock.tick(60)
+    ponderer.stop()
+    pause(3)
 
-    while not game_over:
-        MOUSE_POS = pygame.mouse.get_pos()
-        BACK_BUTTON.update(SCREEN)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT: pygame.quit(); sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if BACK_BUTTON.checkForInput(MOUSE_POS): return
-                if turn == 0:
-                    col = int(event.pos[0] // 182.8)
-                    if is_empty(board, col):
-                        row = check_next_empty_row(board, col)
-                        put_piece(board, row, col, 1)
-                        if win(1, board): game_over = True
-                        turn = 1
-                        draw_board(board)
-
-        if turn == 1 and not game_over:
-            time.sleep(0.5)
-            col = monte_carlo_difficulty(board, player_num=2, simulations=simulations)
-            if col is not None and is_empty(board, col):
-                row = check_next_empty_row(board, col)
-                put_piece(board, row, col, 2)
-                if win(2, board): game_over = True
-                turn = 0
-                draw_board(board)
-    time.sleep(3)
-
-def minimax_game_with_difficulty(depth):
-    board = create_board()
-    game_over = False
-    turn = 0
-    draw_board(board)
-    BACK_BUTTON = Button(image=None, pos=(1150, 690), text_input="BACK", font=get_font(40), base_color="Black", hovering_color="Green")
-
-    while not game_over:
-        MOUSE_POS = pygame.mouse.get_pos()
-        BACK_BUTTON.update(SCREEN)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT: pygame.quit(); sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if BACK_BUTTON.checkForInput(MOUSE_POS): return
-                if turn == 0:
-                    col = int(event.pos[0] // 182.8)
-                    if is_empty(board, col):
-                        row = check_next_empty_row(board, col)
-                        put_piece(board, row, col, 1)
-                        if win(1, board): game_over = True
-                        turn = 1
-                        draw_board(board)
-
-        if turn == 1 and not game_over:
-            time.sleep(0.5)
-            col, score = minimax(board, depth, -math.inf, math.inf, True)
-            if col is not None and is_empty(board, col):
-                row = check_next_empty_row(board, col)
-                put_piece(board, row, col, 2)
-                if win(2, board): game_over = True
-                turn = 0
-                draw_board(board)
-    time.sleep(3)
+def mc_game():
+    engine = MCTSEngine(tree=MCTSTree(), policy=tactical_policy, book=opening_book)
+    play_against_engine(engine, budget_ms=1000)
+
+def monte_carlo_game_custom(simulations, workers=1):
+    if workers > 1:
+        # Start the pool here in the main thread, not from the first search
+        get_mcts_pool(workers)
+    engine = MCTSEngine(simulations=simulations, workers=workers)
+    play_against_engine(engine)
+
+def minimax_game_with_difficulty(depth, time_budget_ms=None, perfect=False):
+    tt = TranspositionTable(size_mb=16)
+    if perfect:
+        engine = PerfectEngine(tt=tt, book=book_for_depth(opening_book))
+    else:
+        # The book only helps when it was searched deeper than the engine would search itself
+        book = book_for_depth(opening_book, TIMED_SEARCH_DEPTH) if time_budget_ms is not None else None
+        engine = MinimaxEngine(depth, tt=tt, book=book)
+    play_against_engine(engine, budget_ms=time_budget_ms)
 
 def ia_vs_ia_game(ia1, ia2):
     board = create_board()
+    tt = TranspositionTable(size_mb=16)
+    ordering = MoveOrdering()
+    # One engine per side, the minimax sides share the table as before
+    engines = []
+    for ia in (ia1, ia2):
+        if ia == "Monte Carlo":
+            engines.append(MCTSEngine(policy=tactical_policy, book=opening_book))
+        elif ia == "Minimax":
+            engines.append(MinimaxEngine(4, tt=tt, ordering=ordering))
+        else:
+            engines.append(AStarEngine(4))
     game_over = False
     turn = 0
     draw_board(board)
@@ -320,15 +322,9 @@ def ia_vs_ia_game(ia1, ia2):
         current_ia = ia1 if turn == 0 else ia2
         player_id = 1 if turn == 0 else 2
         
-        time.sleep(0.5)
-        col = None
-        
-        if current_ia == "Monte Carlo":
-            col = monte_carlo(board, player_num=player_id, time_limit=1)
-        elif current_ia == "Minimax":
-            col, _ = minimax(board, 4, -math.inf, math.inf, True if player_id == 2 else False) 
-        elif current_ia == "A*":
-            col = a_star_with_level(board, 4)
+        budget_ms = 1000 if current_ia == "Monte Carlo" else None
+        left, col = wait_for_move(engines[turn].start(board, player_id, budget_ms=budget_ms), BACK_BUTTON, delay=0.5)
+        if left: return
 
         if col is not None and is_empty(board, col):
             row = check_next_empty_row(board, col)
@@ -342,23 +338,14 @@ def ia_vs_ia_game(ia1, ia2):
             print("Error or Draw")
             game_over = True
             
-    time.sleep(5)
+    pause(5)
 
 def pr_game():
     global c4_tree_full
     if c4_tree_full is None:
-        print("Tree not trained. Starting training...")
         try:
-            # Using os.path to find the dataset correctly
-            df = pd.read_csv(os.path.join(DATA_DIR, "dataset_connect4.csv"))
-            for i in range(42):
-                df[f"pos_{i}"] = df["estado"].str[i]
-            df = df.drop(columns=["estado"])
-            
-            attributes = [f"pos_{i}" for i in range(42)]
-            # 'jogada' is the target column header in the CSV
-            c4_tree_full = id3(df, attributes, "jogada")
-            print("Training completed.")
+            # Loads the cached model; training only happens when the dataset changed
+            c4_tree_full = load_compiled_id3_model(os.path.join(DATA_DIR, "dataset_connect4.csv"))
         except Exception as e:
             print(f"Error loading dataset: {e}")
             return
@@ -386,7 +373,7 @@ def pr_game():
                         draw_board(board)
 
         if turn == 1 and not game_over:
-            time.sleep(1)
+            pause(1)
             col = predict_move_with_tree(board, c4_tree_full)
             if col is not None and is_empty(board, col):
                 row = check_next_empty_row(board, col)
@@ -394,7 +381,7 @@ def pr_game():
                 if win(2, board): game_over = True
                 turn = 0
                 draw_board(board)
-    time.sleep(3)
+    pause(3)
 
 def a_star_difficulty_menu():
     while True:
@@ -434,9 +421,10 @@ def minimax_difficulty_menu():
         EASY_BUTTON = Button(image=PLAY_IMG, pos=(370, 250), text_input="EASY", font=get_font(45), base_color="#d7fcd4", hovering_color="White")
         MEDIUM_BUTTON = Button(image=PLAY_IMG, pos=(370, 350), text_input="MEDIUM", font=get_font(45), base_color="#d7fcd4", hovering_color="White")
         HARD_BUTTON = Button(image=PLAY_IMG, pos=(370, 450), text_input="HARD", font=get_font(45), base_color="#d7fcd4", hovering_color="White")
+        PERFECT_BUTTON = Button(image=PLAY_IMG, pos=(370, 550), text_input="PERFECT", font=get_font(45), base_color="#d7fcd4", hovering_color="White")
         BACK_BUTTON = Button(image=QUIT_IMG, pos=(910, 600), text_input="BACK", font=get_font(45), base_color="#d7fcd4", hovering_color="White")
 
-        for button in [EASY_BUTTON, MEDIUM_BUTTON, HARD_BUTTON, BACK_BUTTON]:
+        for button in [EASY_BUTTON, MEDIUM_BUTTON, HARD_BUTTON, PERFECT_BUTTON, BACK_BUTTON]:
             button.changeColor(MOUSE_POS)
             button.update(SCREEN)
 
@@ -445,7 +433,8 @@ def minimax_difficulty_menu():
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if EASY_BUTTON.checkForInput(MOUSE_POS): minimax_game_with_difficulty(2)
                 if MEDIUM_BUTTON.checkForInput(MOUSE_POS): minimax_game_with_difficulty(4)
-                if HARD_BUTTON.checkForInput(MOUSE_POS): minimax_game_with_difficulty(6)
+                if HARD_BUTTON.checkForInput(MOUSE_POS): minimax_game_with_difficulty(None, time_budget_ms=1000)
+                if PERFECT_BUTTON.checkForInput(MOUSE_POS): minimax_game_with_difficulty(None, time_budget_ms=2000, perfect=True)
                 if BACK_BUTTON.checkForInput(MOUSE_POS): return
 
         pygame.display.update()
@@ -472,7 +461,7 @@ def monte_carlo_difficulty_menu():
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if EASY_BUTTON.checkForInput(MOUSE_POS): monte_carlo_game_custom(30)
                 if MEDIUM_BUTTON.checkForInput(MOUSE_POS): monte_carlo_game_custom(100)
-                if HARD_BUTTON.checkForInput(MOUSE_POS): monte_carlo_game_custom(500)
+                if HARD_BUTTON.checkForInput(MOUSE_POS): monte_carlo_game_custom(500, workers=MCTS_WORKERS)
                 if BACK_BUTTON.checkForInput(MOUSE_POS): return
 
         pygame.display.update()
@@ -558,4 +547,5 @@ def main_menu():
         pygame.display.update()
 
 if __name__ == "__main__":
+    setup_display()
     main_menu()
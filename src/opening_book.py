@@ -0,0 +1,162 @@
+import os
+import sys
+import math
+import mmap
+import random
+import struct
+import argparse
+import numpy as np
+from game_logic import Position, COLUMN_COUNT, BOARD_HEIGHT_BITS
+from ai_algorithms import minimax, TranspositionTable, MoveOrdering, SearchContext
+from solver import Solver
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BOOK_PATH = os.path.join(BASE_DIR, 'data', 'opening_book.bin')
+
+# Header: magic, format version, plies covered, entry count, whether the entries were solved
+# exactly and otherwise the minimax depth behind them. The arrays that follow are keys
+# (uint64, sorted), scores (int32) and moves (int8), so each stays aligned.
+BOOK_MAGIC = b'C4OB'
+BOOK_VERSION = 2
+HEADER = struct.Struct('<4sHHIBB2x')
+COLUMN_BITS = (1 << BOARD_HEIGHT_BITS) - 1
+SCORE_LIMIT = 2 ** 31 - 1
+
+def mirror_bits(bitboard):
+    mirrored = 0
+    for col in range(COLUMN_COUNT):
+        column = (bitboard >> (col * BOARD_HEIGHT_BITS)) & COLUMN_BITS
+        mirrored |= column << ((COLUMN_COUNT - 1 - col) * BOARD_HEIGHT_BITS)
+    return mirrored
+
+def canonical_key(position):
+    # A position and its horizontal mirror share one entry; True means the key is mirrored
+    key = position.key()
+    mirrored = mirror_bits(position.current) + mirror_bits(position.mask)
+    if mirrored < key:
+        return mirrored, True
+    return key, False
+
+class OpeningBook:
+    def __init__(self, path=DEFAULT_BOOK_PATH):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.plies, self.count, exact, self.depth = HEADER.unpack_from(self.mm, 0)
+        self.exact = bool(exact)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            raise ValueError(f"{path} is not a version {BOOK_VERSION} opening book")
+        offset = HEADER.size
+        self.keys = np.frombuffer(self.mm, dtype='<u8', count=self.count, offset=offset)
+        offset += 8 * self.count
+        self.scores = np.frombuffer(self.mm, dtype='<i4', count=self.count, offset=offset)
+        offset += 4 * self.count
+        self.moves = np.frombuffer(self.mm, dtype='i1', count=self.count, offset=offset)
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, board):
+        position = board if isinstance(board, Position) else Position.from_board(board)
+        if position.moves > self.plies:
+            return None
+        key, mirrored = canonical_key(position)
+        index = int(np.searchsorted(self.keys, key))
+        if index == self.count or int(self.keys[index]) != key:
+            return None
+        col = int(self.moves[index])
+        if mirrored:
+            col = COLUMN_COUNT - 1 - col
+        return col, int(self.scores[index])
+
+def load_opening_book(path=DEFAULT_BOOK_PATH):
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+def book_for_depth(book, depth=None):
+    # The book if its moves are at least as good as a search to depth plies would find,
+    # None otherwise; with no depth only a solved book will do
+    if book is None or book.exact:
+        return book
+    return book if depth is not None and book.depth >= depth else None
+
+def book_move(book, board):
+    if book is None:
+        return None
+    entry = book.lookup(board)
+    return entry[0] if entry is not None else None
+
+def write_opening_book(path, plies, entries, exact=False, depth=0):
+    entries = sorted(entries.items())
+    keys = np.array([key for key, _ in entries], dtype='<u8')
+    scores = np.array([max(-SCORE_LIMIT, min(SCORE_LIMIT, score)) for _, (_, score) in entries], dtype='<i4')
+    moves = np.array([move for _, (move, _) in entries], dtype='i1')
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(BOOK_MAGIC, BOOK_VERSION, plies, len(entries), exact, 0 if exact else depth))
+        f.write(keys.tobytes())
+        f.write(scores.tobytes())
+        f.write(moves.tobytes())
+
+def book_positions(plies):
+    # Breadth-first over every non-terminal position up to the given ply, one per mirror pair
+    seen = set()
+    frontier = [Position()]
+    for ply in range(plies + 1):
+        children = []
+        for position in frontier:
+            key, _ = canonical_key(position)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield position
+            if ply == plies:
+                continue
+            for col in position.valid_moves():
+                if position.is_winning_move(col):
+                    continue
+                child = position.copy()
+                child.play(col)
+                if not child.is_full():
+                    children.append(child)
+        frontier = children
+
+def build_opening_book(plies, depth=6, engine="minimax", tt_size_mb=64, seed=0, log_every=500):
+    random.seed(seed)
+    tt = TranspositionTable(size_mb=tt_size_mb)
+    ordering = MoveOrdering()
+    solver = Solver() if engine == "solver" else None
+    entries = {}
+
+    for index, position in enumerate(book_positions(plies)):
+        key, mirrored = canonical_key(position)
+        if engine == "solver":
+            col, score = solver.best_move(position)
+        else:
+            board = position.to_board()
+            maximizing = position.player() == 2
+            col, score = minimax(board, depth, -math.inf, math.inf, maximizing, tt=tt, search=SearchContext(ordering=ordering))
+            # Scores are stored from the side to move's point of view
+            if not maximizing:
+                score = -score
+        if mirrored:
+            col = COLUMN_COUNT - 1 - col
+        entries[key] = (col, score)
+        if log_every and (index + 1) % log_every == 0:
+            print(f"{index + 1} positions searched")
+    return entries
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute an opening book for the Connect 4 engines.")
+    parser.add_argument("--plies", type=int, default=4, help="deepest ply stored in the book")
+    parser.add_argument("--depth", type=int, default=12, help="minimax depth used per position")
+    parser.add_argument("--engine", choices=["minimax", "solver"], default="minimax")
+    parser.add_argument("--tt-size-mb", type=int, default=64)
+    parser.add_argument("--output", default=DEFAULT_BOOK_PATH)
+    args = parser.parse_args(argv)
+
+    entries = build_opening_book(args.plies, args.depth, args.engine, args.tt_size_mb)
+    write_opening_book(args.output, args.plies, entries, args.engine == "solver", args.depth)
+    print(f"Wrote {len(entries)} positions to {args.output}")
+
+if __name__ == "__main__":
+    sys.exit(main())
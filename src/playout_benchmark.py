@@ -0,0 +1,82 @@
+import sys
+import time
+import random
+import argparse
+from game_logic import create_board, check_next_empty_row, put_piece, winning_move, random_opening, ROW_COUNT, COLUMN_COUNT
+from ai_algorithms import MCTS, MCTSTree, best_root_move, simulate, PLAYOUT_POLICIES
+
+def playout_rate(policy, seconds=1.0):
+    # Playouts per second from the empty board
+    board = create_board()
+    start = time.perf_counter()
+    count = 0
+    while time.perf_counter() - start < seconds:
+        simulate(board, 1, policy)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+def opening_board(plies):
+    board = create_board()
+    player = 1
+    for col in random_opening(plies):
+        put_piece(board, check_next_empty_row(board, col), col, player)
+        player = 3 - player
+    return board, player
+
+def play_game(policies, board, player, move_time):
+    # policies maps each player to a playout policy; returns the winner or 0 for a draw
+    trees = {1: MCTSTree(), 2: MCTSTree()}
+    moves = sum(1 for row in board for cell in row if cell)
+    while moves < ROW_COUNT * COLUMN_COUNT:
+        tree = trees[player]
+        tree.advance(board, player)
+        MCTS(tree, move_time, policy=policies[player])
+        col = best_root_move(tree.root_visits(), board, tree.root_proofs())
+        row = check_next_empty_row(board, col)
+        put_piece(board, row, col, player)
+        if winning_move(board, row, col, player):
+            return player
+        moves += 1
+        player = 3 - player
+    return 0
+
+def compare(challenger, baseline, games, move_time, opening_plies=2, seed=0):
+    # Each opening is played twice with the colors swapped; returns (wins, draws, losses)
+    random.seed(seed)
+    results = [0, 0, 0]
+    for game in range(games):
+        if game % 2 == 0:
+            opening, player = opening_board(opening_plies)
+        challenger_side = 1 + game % 2
+        policies = {challenger_side: challenger, 3 - challenger_side: baseline}
+        winner = play_game(policies, [row[:] for row in opening], player, move_time)
+        if winner == challenger_side:
+            results[0] += 1
+        elif winner == 0:
+            results[1] += 1
+        else:
+            results[2] += 1
+        print(f"game {game + 1}: {'win' if winner == challenger_side else 'draw' if winner == 0 else 'loss'}")
+    return tuple(results)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare MCTS playout policies at equal time per move.")
+    parser.add_argument("--policy", choices=sorted(PLAYOUT_POLICIES), default="tactical")
+    parser.add_argument("--baseline", choices=["light"] + sorted(PLAYOUT_POLICIES), default="light",
+                        help="light is the original uniform random simulate()")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--move-time", type=float, default=0.2, help="seconds per move")
+    parser.add_argument("--opening-plies", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    challenger = PLAYOUT_POLICIES[args.policy]
+    baseline = None if args.baseline == "light" else PLAYOUT_POLICIES[args.baseline]
+    print(f"{args.policy}: {playout_rate(challenger):.0f} playouts/s, "
+          f"{args.baseline}: {playout_rate(baseline):.0f} playouts/s")
+    wins, draws, losses = compare(challenger, baseline, args.games, args.move_time, args.opening_plies, args.seed)
+    score = (wins + draws / 2) / args.games
+    print(f"{args.policy} vs {args.baseline}: +{wins} ={draws} -{losses} ({score:.1%})")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from game_logic import (
+    create_board, check_next_empty_row, put_piece, winning_move, get_valid_locations, is_empty, random_opening,
+    ROW_COUNT, COLUMN_COUNT
+)
+from tournament import parse_engine, build_engine
+from dataset import DatasetWriter, CELLS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT_PATH = os.path.join(BASE_DIR, 'data', 'selfplay.csv')
+
+# Engines play each other and every position an engine moves in is written with the move it
+# chose, in the estado,jogada layout of the original dataset (.csv) or the binary one (.npy).
+# Games are dealt to the process pool in small tasks and written in order, a chunk at a time;
+# after each chunk a .progress file next to the output records how far the run got, so an
+# interrupted run continues from there.
+
+def self_play_game(players, opening_plies, epsilon, rng):
+    # players maps 1 and 2 to (engine, budget_ms). With probability epsilon a random move is
+    # played instead of the engine's, which is still the one recorded.
+    board = create_board()
+    player = 1
+    for col in random_opening(opening_plies, rng):
+        put_piece(board, check_next_empty_row(board, col), col, player)
+        player = 3 - player
+
+    positions, moves = [], []
+    for _ in range(opening_plies, ROW_COUNT * COLUMN_COUNT):
+        engine, budget_ms = players[player]
+        col = engine.best_move(board, player, budget_ms)
+        if col is None or not is_empty(board, col):
+            break
+        positions.extend(cell for row in board for cell in row)
+        moves.append(col)
+        if rng.random() < epsilon:
+            col = rng.choice(get_valid_locations(board))
+        row = check_next_empty_row(board, col)
+        put_piece(board, row, col, player)
+        if winning_move(board, row, col, player):
+            break
+        player = 3 - player
+    return positions, moves
+
+def play_games(task):
+    # Games first..first + count - 1; the engines swap colours every game
+    engines, first, count, seed, opening_plies, epsilon = task
+    built = [build_engine(spec) for spec in engines]
+    positions, moves = [], []
+    for game in range(first, first + count):
+        game_seed = seed * 1000003 + game
+        random.seed(game_seed)
+        np.random.seed(game_seed % 2 ** 32)
+        players = {1: built[game % 2], 2: built[1 - game % 2]}
+        game_positions, game_moves = self_play_game(players, opening_plies, epsilon, random.Random(game_seed))
+        positions.extend(game_positions)
+        moves.extend(game_moves)
+    return np.array(positions, dtype=np.uint8).reshape(-1, CELLS), np.array(moves, dtype=np.uint8)
+
+def load_progress(path, settings):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        progress = json.load(f)
+    if progress["settings"] != settings:
+        raise ValueError(f"{path} was written with other settings; use another output or --restart")
+    return progress
+
+def save_progress(path, settings, games, rows):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump({"settings": settings, "games": games, "rows": rows}, f)
+    os.replace(temporary, path)
+
+def generate(output, engines, games, workers=None, games_per_task=8, chunk_rows=100000, opening_plies=4,
+             epsilon=0.0, seed=0, restart=False, log=True):
+    # Returns the number of rows in the output once games games have been played
+    for spec in engines:
+        parse_engine(spec)
+    if len(engines) == 1:
+        engines = engines * 2
+    settings = {"engines": list(engines), "opening_plies": opening_plies, "epsilon": epsilon, "seed": seed}
+    progress_path = output + ".progress"
+    progress = None if restart else load_progress(progress_path, settings)
+    done, rows = (progress["games"], progress["rows"]) if progress else (0, 0)
+    if done >= games:
+        return rows
+
+    writer = DatasetWriter(output, rows)
+    if log and done:
+        print(f"Resuming after {done} games and {rows} positions")
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    buffered_positions, buffered_moves, buffered = [], [], 0
+    buffered_games = saved = done
+
+    def write_chunk():
+        nonlocal buffered_positions, buffered_moves, buffered, saved
+        if buffered_games == saved:
+            return
+        if buffered_moves:
+            writer.append(np.concatenate(buffered_positions), np.concatenate(buffered_moves))
+        writer.sync()
+        save_progress(progress_path, settings, buffered_games, writer.rows)
+        buffered_positions, buffered_moves, buffered = [], [], 0
+        saved = buffered_games
+        if log:
+            elapsed = time.perf_counter() - start
+            print(f"{buffered_games}/{games} games, {writer.rows} positions "
+                  f"({(writer.rows - rows) / elapsed:.0f} positions/s)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Only a few tasks are in flight at once, so memory stays bounded however many games are asked for
+            pending = deque()
+            firsts = iter(range(done, games, games_per_task))
+            while True:
+                for first in firsts:
+                    count = min(games_per_task, games - first)
+                    pending.append((count, pool.submit(play_games, (engines, first, count, seed, opening_plies, epsilon))))
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    break
+                count, future = pending.popleft()
+                positions, moves = future.result()
+                buffered_positions.append(positions)
+                buffered_moves.append(moves)
+                buffered += len(moves)
+                buffered_games += count
+                if buffered >= chunk_rows:
+                    write_chunk()
+        write_chunk()
+    finally:
+        writer.close()
+    return writer.rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate estado,jogada training data from engine self-play.")
+    parser.add_argument("engines", nargs="+", help='one or two engine specs as in tournament.py, such as "minimax:depth=4"')
+    parser.add_argument("--games", type=int, default=1000, help="total games, counting those of an earlier run")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH, help="a .csv, or a .npy for the binary format")
+    parser.add_argument("--workers", type=int, default=None, help="processes, defaults to the CPU count")
+    parser.add_argument("--games-per-task", type=int, default=8)
+    parser.add_argument("--chunk-rows", type=int, default=100000, help="positions buffered before each write")
+    parser.add_argument("--opening-plies", type=int, default=4, help="random moves played before the engines take over")
+    parser.add_argument("--epsilon", type=float, default=0.0, help="chance of playing a random move instead of the engine's")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--restart", action="store_true", help="overwrite the output instead of resuming")
+    args = parser.parse_args(argv)
+
+    if len(args.engines) > 2:
+        parser.error("at most two engines play each other")
+    start = time.perf_counter()
+    rows = generate(args.output, args.engines, args.games, args.workers, args.games_per_task, args.chunk_rows,
+                    args.opening_plies, args.epsilon, args.seed, args.restart)
+    print(f"{rows} positions in {args.output} ({time.perf_counter() - start:.1f} s)")
+
+if __name__ == "__main__":
+    sys.exit(main())
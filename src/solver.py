@@ -0,0 +1,194 @@
+import time
+from array import array
+from game_logic import Position, ROW_COUNT, COLUMN_COUNT, column_mask
+from ai_algorithms import SearchTimeout, TranspositionTable, iterative_deepening
+
+# Scores follow the usual convention for solved Connect 4: 0 is a draw, a positive
+# score means the player to move wins, and the sooner the win the larger the score
+# (the player who wins with their k-th stone scores 22 - k).
+CELLS = ROW_COUNT * COLUMN_COUNT
+MIN_SCORE = -(CELLS // 2) + 3
+MAX_SCORE = (CELLS + 1) // 2 - 3
+COLUMN_ORDER = [3, 2, 4, 1, 5, 0, 6]
+# Fraction of perfect_move's budget given to the exact solver
+SOLVE_SHARE = 0.5
+
+class SolverTable:
+    # Lossy table of upper bounds; a prime size spreads the position keys evenly
+    def __init__(self, size=2097169):
+        self.size = size
+        self.keys = array('Q', bytes(8 * size))
+        self.values = array('b', bytes(size))
+
+    def put(self, key, value):
+        slot = key % self.size
+        self.keys[slot] = key
+        self.values[slot] = value
+
+    def get(self, key):
+        slot = key % self.size
+        if self.keys[slot] == key:
+            return self.values[slot]
+        return 0
+
+    def clear(self):
+        self.keys = array('Q', bytes(8 * self.size))
+        self.values = array('b', bytes(self.size))
+
+class Solver:
+    def __init__(self, table=None):
+        self.table = table if table is not None else SolverTable()
+        self.nodes = 0
+        self.deadline = None
+        self.stop = None
+
+    def negamax(self, position, alpha, beta):
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchTimeout()
+            if self.stop is not None and self.stop.is_set():
+                raise SearchTimeout()
+
+        non_losing = position.possible_non_losing_moves()
+        if non_losing == 0:
+            return -((CELLS - position.moves) // 2)
+        if position.moves >= CELLS - 2:
+            return 0
+
+        # The opponent cannot win on their next move, so the score is bounded below
+        lower = -((CELLS - 2 - position.moves) // 2)
+        if alpha < lower:
+            alpha = lower
+            if alpha >= beta:
+                return alpha
+
+        upper = (CELLS - 1 - position.moves) // 2
+        key = position.key()
+        stored = self.table.get(key)
+        if stored:
+            upper = stored + MIN_SCORE - 1
+        if beta > upper:
+            beta = upper
+            if alpha >= beta:
+                return beta
+
+        moves = [col for col in COLUMN_ORDER if non_losing & column_mask(col)]
+        if len(moves) > 1:
+            # Stable sort keeps the center-first order between equally threatening moves
+            moves.sort(key=position.move_score, reverse=True)
+
+        for col in moves:
+            position.play(col)
+            score = -self.negamax(position, -beta, -alpha)
+            position.undo(col)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.table.put(key, alpha - MIN_SCORE + 1)
+        return alpha
+
+    def solve(self, position, weak=False, deadline=None, stop=None):
+        if position.can_win_next():
+            return (CELLS + 1 - position.moves) // 2
+        low = -((CELLS - position.moves) // 2)
+        high = (CELLS + 1 - position.moves) // 2
+        if weak:
+            low, high = -1, 1
+
+        self.deadline = deadline
+        self.stop = stop
+        try:
+            # Null-window searches narrow [low, high], probing near zero first
+            while low < high:
+                med = low + (high - low) // 2
+                if med <= 0 and int(low / 2) < med:
+                    med = int(low / 2)
+                elif med >= 0 and int(high / 2) > med:
+                    med = int(high / 2)
+                result = self.negamax(position, med, med + 1)
+                if result <= med:
+                    high = result
+                else:
+                    low = result
+        finally:
+            self.deadline = None
+            self.stop = None
+        return low
+
+    def analyze(self, position, weak=False, deadline=None, stop=None):
+        scores = [None] * COLUMN_COUNT
+        for col in range(COLUMN_COUNT):
+            if not position.can_play(col):
+                continue
+            if position.is_winning_move(col):
+                scores[col] = (CELLS + 1 - position.moves) // 2
+            else:
+                position.play(col)
+                try:
+                    scores[col] = -self.solve(position, weak, deadline, stop)
+                finally:
+                    position.undo(col)
+        return scores
+
+    def best_move(self, position, deadline=None, stop=None):
+        best_col, best_score = None, None
+        for col in COLUMN_ORDER:
+            if position.can_play(col) and position.is_winning_move(col):
+                return col, (CELLS + 1 - position.moves) // 2
+        for col in COLUMN_ORDER:
+            if not position.can_play(col):
+                continue
+            position.play(col)
+            try:
+                score = -self.solve(position, deadline=deadline, stop=stop)
+            finally:
+                position.undo(col)
+            if best_score is None or score > best_score:
+                best_col, best_score = col, score
+        return best_col, best_score
+
+def moves_to_end(position, score):
+    # Plies until the game is decided with perfect play, or None for a draw
+    if score == 0:
+        return None
+    stones = (CELLS + 2) // 2 - abs(score)
+    if score > 0:
+        return 2 * (stones - position.moves // 2) - 1
+    return 2 * (stones - (position.moves + 1) // 2)
+
+def solve_board(board, solver=None, weak=False):
+    if solver is None:
+        solver = Solver()
+    return solver.solve(Position.from_board(board), weak)
+
+def perfect_move(board, time_budget_ms=1000, solver=None, tt=None, book=None, stop=None, progress=None):
+    # Exact play when the solver finishes in time, iterative deepening otherwise.
+    # A budget of None solves until stop is set.
+    # Only a solved book has moves and scores as exact as the solver's
+    if book is not None and book.exact:
+        entry = book.lookup(board)
+        if entry is not None:
+            return entry[0], entry[1], True
+    if solver is None:
+        solver = Solver()
+    position = Position.from_board(board)
+    start = time.perf_counter()
+    # The solver only gets a share of the budget, so a timed-out solve still leaves the
+    # fallback enough time to search as deep as a plain iterative deepening would
+    deadline = start + SOLVE_SHARE * time_budget_ms / 1000 if time_budget_ms is not None else None
+    try:
+        col, score = solver.best_move(position, deadline=deadline, stop=stop)
+        if progress is not None:
+            progress({"move": col, "score": score, "depth": CELLS - position.moves, "nodes": solver.nodes, "pv": [col]})
+        return col, score, True
+    except SearchTimeout:
+        remaining = 1
+        if time_budget_ms is not None:
+            remaining = max(time_budget_ms - (time.perf_counter() - start) * 1000, 1)
+        if tt is None:
+            tt = TranspositionTable()
+        col, score, _ = iterative_deepening(board, remaining, position.player() == 2, tt, stop=stop, progress=progress)
+        return col, score, False
@@ -0,0 +1,219 @@
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from game_logic import (
+    create_board, check_next_empty_row, put_piece, winning_move, is_empty, random_opening, ROW_COUNT, COLUMN_COUNT
+)
+from ai_algorithms import TranspositionTable, MCTSTree, PLAYOUT_POLICIES
+from engine import MinimaxEngine, PerfectEngine, MCTSEngine, AStarEngine, ID3Engine
+from id3_model import load_compiled_id3_model, DEFAULT_DATASET_PATH
+
+# Engines are given as "name:key=value,key=value", for example "minimax:depth=4",
+# "id:time=100", "mcts:sims=400,policy=tactical", "astar:level=2", "perfect:time=500" or
+# "id3:dataset=data/selfplay.npy" for the learned tree trained on that dataset.
+# time is the budget per move in milliseconds; without it fixed-size searches run to the end.
+ENGINE_PARAMS = {
+    "minimax": {"depth": 4, "tt": 4},
+    "id": {"time": 100, "depth": None, "tt": 4},
+    "mcts": {"time": None, "sims": 400, "policy": None, "playouts": 1, "c": 2, "reuse": 0},
+    "astar": {"level": None},
+    "perfect": {"time": 500, "tt": 4},
+    "id3": {"dataset": DEFAULT_DATASET_PATH},
+}
+# Options given as text rather than numbers
+TEXT_PARAMS = {"policy", "dataset"}
+# Compiled ID3 models by dataset path, loaded once per process
+_id3_models = {}
+
+def parse_engine(spec):
+    name, _, options = spec.partition(":")
+    if name not in ENGINE_PARAMS:
+        raise ValueError(f"Unknown engine {name!r}, expected one of {', '.join(ENGINE_PARAMS)}")
+    params = dict(ENGINE_PARAMS[name])
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        if key not in params:
+            raise ValueError(f"Unknown option {key!r} for {name}, expected one of {', '.join(params)}")
+        if key == "policy" and value not in PLAYOUT_POLICIES:
+            raise ValueError(f"Unknown playout policy {value!r}")
+        if key in TEXT_PARAMS:
+            params[key] = value
+        else:
+            params[key] = float(value) if "." in value else int(value)
+    return name, params
+
+def build_engine(spec):
+    # Returns the engine and its budget per move in milliseconds
+    name, params = parse_engine(spec)
+    if name == "minimax":
+        return MinimaxEngine(params["depth"], tt=TranspositionTable(size_mb=params["tt"])), None
+    if name == "id":
+        return MinimaxEngine(params["depth"], tt=TranspositionTable(size_mb=params["tt"])), params["time"]
+    if name == "mcts":
+        # Simulation counts only apply when no time budget is given
+        simulations = params["sims"] if params["time"] is None else None
+        policy = PLAYOUT_POLICIES[params["policy"]] if params["policy"] else None
+        tree = MCTSTree(exploration=params["c"]) if params["reuse"] else None
+        return MCTSEngine(tree=tree, simulations=simulations, playouts=params["playouts"], policy=policy,
+                          exploration=params["c"]), params["time"]
+    if name == "astar":
+        return AStarEngine(params["level"]), None
+    if name == "id3":
+        if params["dataset"] not in _id3_models:
+            _id3_models[params["dataset"]] = load_compiled_id3_model(params["dataset"])
+        return ID3Engine(_id3_models[params["dataset"]]), None
+    return PerfectEngine(tt=TranspositionTable(size_mb=params["tt"])), params["time"]
+
+def play_game(first, second, opening, seed):
+    # Plays one game, first moves first. Returns the winner (1, 2 or 0 for a draw), the move
+    # list and each player's search times in seconds
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    players = {1: build_engine(first), 2: build_engine(second)}
+    times = {1: [], 2: []}
+    board = create_board()
+    moves = list(opening)
+    player = 1
+    for col in opening:
+        put_piece(board, check_next_empty_row(board, col), col, player)
+        player = 3 - player
+
+    while len(moves) < ROW_COUNT * COLUMN_COUNT:
+        engine, budget_ms = players[player]
+        start = time.perf_counter()
+        col = engine.best_move(board, player, budget_ms)
+        times[player].append(time.perf_counter() - start)
+        if col is None or not is_empty(board, col):
+            # An illegal move loses the game
+            return {"winner": 3 - player, "moves": moves, "times": times, "illegal": True}
+        row = check_next_empty_row(board, col)
+        put_piece(board, row, col, player)
+        moves.append(col)
+        if winning_move(board, row, col, player):
+            return {"winner": player, "moves": moves, "times": times}
+        player = 3 - player
+    return {"winner": 0, "moves": moves, "times": times}
+
+def run_pairing(args):
+    a, b, opening, swap, seed = args
+    first, second = (b, a) if swap else (a, b)
+    result = play_game(first, second, opening, seed)
+    winner = result["winner"]
+    # Score from a's point of view
+    a_side = 2 if swap else 1
+    score = 0.5 if winner == 0 else 1.0 if winner == a_side else 0.0
+    return {"a": a, "b": b, "swap": swap, "opening": opening, "seed": seed, "score": score,
+            "plies": len(result["moves"]), "times_a": result["times"][a_side], "times_b": result["times"][3 - a_side],
+            "illegal": result.get("illegal", False)}
+
+def schedule(engines, games, mode, opening_plies, seed):
+    # Each opening is played twice per pairing with the colours swapped
+    if mode == "gauntlet":
+        pairings = [(engines[0], other) for other in engines[1:]]
+    else:
+        pairings = list(itertools.combinations(engines, 2))
+    rng = random.Random(seed)
+    tasks = []
+    for a, b in pairings:
+        for game in range(games):
+            if game % 2 == 0:
+                opening = random_opening(opening_plies, rng)
+            tasks.append((a, b, opening, game % 2 == 1, seed * 1000003 + len(tasks)))
+    return tasks
+
+def elo_interval(scores, z=1.96):
+    # Elo difference for the mean score, with a normal-approximation confidence interval
+    n = len(scores)
+    mean = sum(scores) / n
+    deviation = math.sqrt(sum((s - mean) ** 2 for s in scores) / (n - 1)) if n > 1 else 0.0
+    margin = z * deviation / math.sqrt(n)
+
+    def to_elo(p):
+        p = min(max(p, 1e-3), 1 - 1e-3)
+        return -400 * math.log10(1 / p - 1)
+    return to_elo(mean), to_elo(mean - margin), to_elo(mean + margin)
+
+def summarize(results):
+    pairings = {}
+    timings = {}
+    for result in results:
+        pairings.setdefault((result["a"], result["b"]), []).append(result)
+        timings.setdefault(result["a"], []).extend(result["times_a"])
+        timings.setdefault(result["b"], []).extend(result["times_b"])
+
+    summary = {"pairings": [], "engines": {}}
+    for (a, b), games in pairings.items():
+        scores = [game["score"] for game in games]
+        estimate, low, high = elo_interval(scores)
+        summary["pairings"].append({
+            "a": a, "b": b, "games": len(games),
+            "wins": scores.count(1.0), "draws": scores.count(0.5), "losses": scores.count(0.0),
+            "score": sum(scores) / len(scores), "elo": estimate, "elo_low": low, "elo_high": high,
+            "illegal": sum(game["illegal"] for game in games),
+        })
+    for name, values in timings.items():
+        values = sorted(values)
+        summary["engines"][name] = {
+            "moves": len(values),
+            "mean_ms": 1000 * sum(values) / len(values) if values else 0.0,
+            "p95_ms": 1000 * values[int(0.95 * (len(values) - 1))] if values else 0.0,
+            "max_ms": 1000 * values[-1] if values else 0.0,
+        }
+    return summary
+
+def print_summary(summary, elapsed, games):
+    print(f"\n{games} games in {elapsed:.1f} s ({3600 * games / elapsed:.0f} games/hour)\n")
+    for p in summary["pairings"]:
+        print(f"{p['a']} vs {p['b']}: +{p['wins']} ={p['draws']} -{p['losses']} "
+              f"score {p['score']:.3f}, Elo {p['elo']:+.0f} [{p['elo_low']:+.0f}, {p['elo_high']:+.0f}]"
+              + (f", {p['illegal']} illegal moves" if p["illegal"] else ""))
+    print("\nPer-move search time")
+    for name, t in summary["engines"].items():
+        print(f"{name}: {t['moves']} moves, mean {t['mean_ms']:.1f} ms, p95 {t['p95_ms']:.1f} ms, max {t['max_ms']:.1f} ms")
+
+def run_tournament(engines, games=20, mode="roundrobin", workers=None, opening_plies=2, seed=0, log_every=100):
+    for spec in engines:
+        # Models are trained or loaded here once, not by every worker at the same time
+        if parse_engine(spec)[0] == "id3":
+            build_engine(spec)
+    tasks = schedule(engines, games, mode, opening_plies, seed)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(run_pairing, tasks, chunksize=max(1, len(tasks) // (8 * (workers or 8)))):
+            results.append(result)
+            if log_every and len(results) % log_every == 0:
+                print(f"{len(results)}/{len(tasks)} games played")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play engines against each other without the GUI.")
+    parser.add_argument("engines", nargs="+", help='engine specs such as "minimax:depth=4" or "mcts:sims=400,policy=tactical"')
+    parser.add_argument("--games", type=int, default=20, help="games per pairing, rounded up to an even number")
+    parser.add_argument("--mode", choices=["roundrobin", "gauntlet"], default="roundrobin",
+                        help="gauntlet plays the first engine against each of the others")
+    parser.add_argument("--workers", type=int, default=None, help="processes, defaults to the CPU count")
+    parser.add_argument("--opening-plies", type=int, default=2, help="random moves played before the engines take over")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write every game and the summary to this file")
+    args = parser.parse_args(argv)
+
+    if len(args.engines) < 2:
+        parser.error("at least two engines are needed")
+    games = args.games + args.games % 2
+    start = time.perf_counter()
+    results = run_tournament(args.engines, games, args.mode, args.workers, args.opening_plies, args.seed)
+    elapsed = time.perf_counter() - start
+    summary = summarize(results)
+    print_summary(summary, elapsed, len(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"games": results, "summary": summary}, f, indent=1)
+
+if __name__ == "__main__":
+    sys.exit(main())